@@ -0,0 +1,273 @@
+import json
+import os
+import sys
+import time
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+from quickparse import QuickParse
+
+import lib
+from fake_jira_data import fake_jira_base_url, generate_search_payload, generate_fake_issue
+from loadtest import create_workspace
+
+
+default_bench_sizes = (100, 1000, 10000, 50000)
+default_bench_repeat = 3
+default_bench_output_file = 'bench_results.json'
+default_regression_threshold = 0.2
+changed_issue_ratio = 0.1
+default_startup_repeat = 10
+# commands that answer without the network, None is the bare interpreter to compare with
+startup_commands = (
+    ('interpreter', None),
+    ('help', ['h']),
+    ('list_queue', ['ls']),
+    ('alert', ['a']),
+    ('step_queue', ['q']),
+    ('open', ['o', '1']),
+)
+
+bench_help_text = ''' -- cue microbenchmarks --
+python bench.py [--sizes 100,1000,10000,50000] [--repeat 3] [--only construct,format_long] [--output bench_results.json] [--compare baseline.json] [--threshold 0.2]
+   times issue parsing, rendering, cache and change detection on generated Jira search payloads
+python bench.py --startup [--repeat 10] [--output startup_results.json] [--compare baseline.json]
+   times the startup of the local commands in fresh interpreters, with the import time as 'python -X importtime' reports it
+'''
+
+options_config = (
+    ('-s', '--sizes', str),
+    ('-r', '--repeat', int),
+    ('-n', '--only', str),
+    ('-o', '--output', str),
+    ('-c', '--compare', str),
+    ('-t', '--threshold', float),
+    ('-u', '--startup'),
+    ('-h', '--help'),
+)
+
+
+def setup_lib(work_dir):
+    lib.jira_instance_url = fake_jira_base_url
+    lib.result_files_dir = work_dir
+    lib.issue_store_file = 'issues.sqlite3'
+    lib.all_issues_file = 'all_issues.txt'
+    reset_lib_caches()
+
+def reset_lib_caches():
+    if lib.issue_store is not None:
+        lib.issue_store.close()
+    lib.issue_store = None
+    lib.all_issues_cache = None
+    lib.render_plans.clear()
+
+def get_changed_payload(payload):
+    issue_objs = list(payload['issues'])
+    step = max(1, int(1 / changed_issue_ratio))
+    for index in range(0, len(issue_objs), step):
+        issue_number = int(issue_objs[index]['key'].split('-')[1])
+        issue_objs[index] = generate_fake_issue(issue_number, revision=1)
+    return dict(payload, issues=issue_objs)
+
+def bench_construct(payload, work_dir):
+    while True:
+        yield lambda: lib.JiraIssues(payload['issues'])
+
+def bench_format(variant):
+    def bench(payload, work_dir):
+        issues = lib.JiraIssues(payload['issues'])
+        lib.update_all_issues_cache(issues)
+        while True:
+            yield lambda: issues.format(variant=variant, add_colors=True, expand_links=True, align_field_separator=True)
+    return bench
+
+def bench_cache_write(payload, work_dir):
+    issues = lib.JiraIssues(payload['issues'])
+    while True:
+        reset_lib_caches()
+        issue_store_path = os.path.join(work_dir, lib.issue_store_file)
+        if os.path.isfile(issue_store_path):
+            os.remove(issue_store_path)
+        lib.get_issue_store()
+        yield lambda: lib.update_all_issues_cache(issues)
+
+def bench_cache_load(payload, work_dir):
+    lib.update_all_issues_cache(lib.JiraIssues(payload['issues']))
+    while True:
+        lib.all_issues_cache = None
+        yield lambda: lib.load_all_issues_cache()
+
+def bench_import_text(payload, work_dir):
+    text = lib.JiraIssues(payload['issues']).format(variant='long', add_colors=False, expand_links=False, add_separator_to_multiline=False)
+    while True:
+        yield lambda: lib.import_core_data_sets(text)
+
+def bench_updated_issues(payload, work_dir):
+    stored_query_issues = lib.JiraIssues(payload['issues'])
+    lib.update_all_issues_cache(stored_query_issues)
+    lib.write_query_results('bench', stored_query_issues, {'jql': 'project = UI', 'last_sync': datetime.now(timezone.utc)})
+    changed_payload = get_changed_payload(payload)
+    while True:
+        lib.all_issues_cache = None
+        issues = lib.JiraIssues(changed_payload['issues'])
+        yield lambda: lib.get_updated_issues(issues, lib.get_stored_issues(lib.load_query_results('bench')))
+
+benchmarks = (
+    ('construct', bench_construct),
+    ('format_oneline', bench_format('oneline')),
+    ('format_compact', bench_format('compact')),
+    ('format_long', bench_format('long')),
+    ('cache_write', bench_cache_write),
+    ('cache_load', bench_cache_load),
+    ('import_text', bench_import_text),
+    ('updated_issues', bench_updated_issues),
+)
+
+def run_benchmark(bench, payload, repeat):
+    timings = list()
+    with tempfile.TemporaryDirectory(prefix='cue-bench-') as work_dir:
+        setup_lib(work_dir)
+        runs = bench(payload, work_dir)
+        for _ in range(repeat):
+            run = next(runs)
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        reset_lib_caches()
+    return timings
+
+def run_cue_command(work_dir, cli_args, *, import_time = False):
+    command = [sys.executable, *(['-X', 'importtime'] if import_time is True else []), *(['-c', 'pass'] if cli_args is None else [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cue.py'), *cli_args])]
+    # BROWSER makes 'o' run a no-op command instead of opening a browser
+    environment = dict(os.environ, BROWSER='true')
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=work_dir, env=environment, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    return time.perf_counter() - start, completed
+
+def parse_import_times(importtime_output):
+    # 'import time: self [us] | cumulative | imported package' lines, the top level imports add up to the total
+    imports = list()
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_time, cumulative_time, module = line[len('import time:'):].split('|')
+        imports.append((module.rstrip(), int(self_time), int(cumulative_time)))
+    total_us = sum(cumulative_time for module, self_time, cumulative_time in imports if not module.startswith('  '))
+    slowest = sorted(imports, key=lambda item: item[1], reverse=True)[:5]
+    return total_us, len(imports), [(module.strip(), self_time) for module, self_time, cumulative_time in slowest]
+
+def run_startup_benchmarks(repeat, only = None):
+    results = dict()
+    with tempfile.TemporaryDirectory(prefix='cue-bench-') as work_dir:
+        create_workspace(work_dir, fake_jira_base_url, dict())
+        for name, cli_args in startup_commands:
+            if only is not None and name not in only:
+                continue
+            timings = [run_cue_command(work_dir, cli_args)[0] for _ in range(repeat)]
+            wall_time, completed = run_cue_command(work_dir, cli_args, import_time=True)
+            import_us, module_count, slowest = parse_import_times(completed.stderr)
+            result = {
+                'best': min(timings),
+                'mean': sum(timings) / len(timings),
+                'import_ms': import_us / 1000,
+                'modules': module_count,
+                'slowest_imports': slowest,
+                'runs': timings,
+            }
+            results.setdefault(f"startup_{name}", dict())['cli'] = result
+            print(f"{name:>16}: best {result['best'] * 1000:8.1f} ms  mean {result['mean'] * 1000:8.1f} ms  imports {result['import_ms']:7.1f} ms  {module_count:4} modules  slowest: {', '.join(f'{module} {self_time / 1000:.1f}' for module, self_time in slowest[:3])}")
+    return results
+
+def get_git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except Exception:
+        return None
+
+def get_results_meta(repeat):
+    return {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'revision': get_git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+    }
+
+def run_benchmarks(sizes, repeat, only = None):
+    results = dict()
+    for size in sizes:
+        payload = generate_search_payload(size)
+        for name, bench in benchmarks:
+            if only is not None and name not in only:
+                continue
+            timings = run_benchmark(bench, payload, repeat)
+            result = {
+                'best': min(timings),
+                'mean': sum(timings) / len(timings),
+                'per_issue_us': min(timings) / size * 1e6,
+                'runs': timings,
+            }
+            results.setdefault(name, dict())[str(size)] = result
+            print(f"{name:>16} {size:>6}: best {result['best'] * 1000:10.2f} ms  mean {result['mean'] * 1000:10.2f} ms  {result['per_issue_us']:8.2f} us/issue")
+    return {
+        'meta': get_results_meta(repeat),
+        'results': results,
+    }
+
+def compare_results(results, baseline, threshold):
+    regressions = list()
+    print(f"\nCompared to {baseline['meta'].get('revision') or 'baseline'} ({baseline['meta'].get('created')}):")
+    for name, sizes in results['results'].items():
+        for size, result in sizes.items():
+            baseline_result = baseline['results'].get(name, dict()).get(size)
+            if baseline_result is None:
+                continue
+            ratio = result['best'] / baseline_result['best'] if baseline_result['best'] > 0 else float('inf')
+            marker = ''
+            if ratio > 1 + threshold:
+                marker = '  REGRESSION'
+                regressions.append((name, size, ratio))
+            print(f"{name:>16} {size:>6}: {baseline_result['best'] * 1000:10.2f} ms -> {result['best'] * 1000:10.2f} ms  x{ratio:.2f}{marker}")
+    return regressions
+
+def main():
+    quickparse = QuickParse(options_config=options_config)
+    if '--help' in quickparse.options:
+        sys.stdout.write(bench_help_text)
+        return 0
+    is_startup = '--startup' in quickparse.options
+    sizes = default_bench_sizes
+    if '--sizes' in quickparse.options:
+        sizes = tuple(int(size) for size in quickparse.options['--sizes'].split(','))
+    only = None
+    if '--only' in quickparse.options:
+        only = set(quickparse.options['--only'].split(','))
+        unknown_names = only - set(name for name, bench in (startup_commands if is_startup else benchmarks))
+        assert len(unknown_names) == 0, f"Unknown benchmarks: {', '.join(sorted(unknown_names))}"
+    repeat = quickparse.options.get('--repeat', default_startup_repeat if is_startup else default_bench_repeat)
+    assert repeat > 0, f"Invalid repeat count: {repeat}"
+    if is_startup:
+        results = {'meta': get_results_meta(repeat), 'results': run_startup_benchmarks(repeat, only)}
+    else:
+        results = run_benchmarks(sizes, repeat, only)
+    output_file = quickparse.options.get('--output', default_bench_output_file)
+    with open(output_file, 'w+') as jsonfile:
+        jsonfile.write(json.dumps(results, indent=2))
+    print(f"Results written to {output_file}")
+    if '--compare' in quickparse.options:
+        baseline = json.loads(open(quickparse.options['--compare']).read())
+        regressions = compare_results(results, baseline, quickparse.options.get('--threshold', default_regression_threshold))
+        if len(regressions) > 0:
+            print(f"{len(regressions)} regression(s) over {quickparse.options.get('--threshold', default_regression_threshold):.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except AssertionError as ae:
+        print(f'{ae}')
+        sys.exit(2)
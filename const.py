@@ -44,30 +44,22 @@ required_config_keys = (
     'all_issues_file',
 )
 
-requested_issue_fields = (
-    'summary',
-    'issuetype',
-    'assignee',
-    'customfield_10104',
-    'project',
-    'status',
-    'resolution',
-    'customfield_13621',
-    'customfield_11207',
-    'creator',
-    'created',
-    'updated',
-    'labels',
-    'description',
-    'timespent',
-    'timeestimate',
-    'timeoriginalestimate',
-    'progress',
-    'customfield_13613',
-    'customfield_13611',
-    'customfield_10100',
-    'customfield_10106',
-)
+optional_config_defaults = {
+    'search_page_size': 100,
+    'search_page_workers': 8,
+    'http_pool_connections': 4,
+    'http_pool_maxsize': 16,
+    'query_workers': 4,
+    'issue_store_file': 'issues.sqlite3',
+    'stream_responses': True,
+    'watch_interval_minutes': 15,
+    'response_cache_file': 'responses.sqlite3',
+    'response_cache_ttl_minutes': 5,
+    'response_cache_max_mb': 64,
+    'queue_store_file': 'queue.sqlite3',
+    'request_max_concurrency': 16,
+    'request_max_retries': 4,
+}
 
 issue_display_keys = (
     ('title', 'Title'),
@@ -88,8 +80,51 @@ issue_display_keys = (
     ('time_spent_str', 'Time spent'),
     ('original_estimate_str', 'Estimate'),
 )
+issue_display_names = dict(issue_display_keys)
+# only these fields can hold a bare issue key worth expanding with the issue title
+issue_link_fields = ('parent', 'epic')
+subtask_issue_type = 'Sub-task'
+interned_issue_fields = ('assignee', 'status', 'type', 'resolution', 'target_version', 'creator', 'epic', 'sprints_str', 'last_sprint')
 display_key_len = max(len(item[1]) for item in issue_display_keys)
 
+# the Jira fields each issue attribute is made of, an issue fetched without some of them gets those filled on first access
+issue_attr_fields = {
+    'title': ('summary', ),
+    'type': ('issuetype', ),
+    'assignee': ('assignee', ),
+    'status': ('status', ),
+    'resolution': ('resolution', ),
+    'target_version': ('customfield_13621', ),
+    'creator': ('creator', ),
+    'project': ('customfield_13613', ),
+    'fr': ('customfield_13611', ),
+    'epic': ('customfield_10100', ),
+    'parent': ('parent', ),
+    'story_points': ('customfield_10106', ),
+    'time_spent': ('timespent', ),
+    'time_spent_str': ('timespent', ),
+    'estimate': ('timeestimate', ),
+    'estimate_str': ('timeestimate', ),
+    'original_estimate': ('timeoriginalestimate', ),
+    'original_estimate_str': ('timeoriginalestimate', ),
+    'progress': ('progress', ),
+    'git_branches': ('customfield_11207', ),
+    'created': ('created', ),
+    'created_str': ('created', ),
+    'updated': ('updated', ),
+    'updated_str': ('updated', ),
+    'labels': ('labels', ),
+    'labels_str': ('labels', ),
+    'sprints': ('customfield_10104', ),
+    'last_sprint': ('customfield_10104', ),
+    'sprints_str': ('customfield_10104', ),
+}
+issue_source_fields = frozenset(field for fields in issue_attr_fields.values() for field in fields)
+# what the issue store and the change detection of the queries need, the description feeds the local search,
+# an issue whose 'updated' timestamp hasn't moved is not compared field by field
+core_issue_fields = tuple(dict.fromkeys(field for key, name in issue_display_keys for field in issue_attr_fields.get(key, tuple())))
+requested_issue_fields = core_issue_fields + ('updated', 'description')
+
 issue_fields_oneline = (
     ('url', 0, '', (CLR.l_black, {'browse/': CLR.l_yellow})),
     ('title', 70, '', CLR.l_white),
@@ -146,24 +181,74 @@ issue_fields_long = (
     ('time_spent_str', 0, '', CLR.l_yellow, None),
     ('original_estimate_str', 0, '', CLR.l_magenta, None),
 )
+# listings ask Jira only for the fields of the attributes their variant shows
+issue_fields_by_variant = {
+    'oneline': (issue_fields_oneline, ),
+    'compact': (issue_fields_compact_head, issue_fields_compact_conditional_rows, issue_fields_compact_body),
+    'long': (issue_fields_long, ),
+}
 issue_fields_vertical_separator = '·' * shutil.get_terminal_size().columns
 issue_fields_vertical_separator_color = CLR.l_black
 
+# the text queue of earlier versions, imported into the queue store once
 queue_file_name = 'queue.txt'
+queue_item_re = re.compile(r'^(?P<query_title>.+?) -- (?P<key>[a-zA-Z]+-\d+) - (?P<title>.*?)(?: \[(?P<changed_fields>[^\]]*)\])?$')
+queue_alert_max_items = 10
+query_results_file_suffix = '.json'
+delta_sync_overlap_minutes = 2
+
+# these answer without config.toml and key.txt
+config_free_command_names = ('h', 'help', 'o', 'open')
+
+# in the REPL these run as background jobs unless they are answered locally, any command ending in '&' does too
+background_command_names = ('x', 'exec', 'execute', 'xq', 'exec-query', 'execute-query', 's', 'search')
+
+# 'cue watch' spreads the refreshes by this ratio of the interval and backs off exponentially after errors
+watch_jitter_ratio = 0.1
+watch_retry_base_seconds = 30
+watch_max_backoff_seconds = 3600
+watch_max_sleep_seconds = 30
 
 request_timeout_seconds = 120
+# the requests in flight start at this many and grow while the responses are as fast as usual,
+# they are cut by the factor when the recent latency goes over the tolerated ratio of the usual one or the server throttles
+request_initial_concurrency = 4
+request_latency_tolerance = 3.0
+request_decrease_factor = 0.5
+throttle_status_codes = (429, 502, 503, 504)
+retried_status_codes = (429, 500, 502, 503, 504)
+request_retry_base_seconds = 1
+request_retry_max_seconds = 60
+request_max_retry_after_seconds = 300
+stream_chunk_size = 1 << 16
+issue_refs_chunk_size = 100
+issue_refs_chunk_max_length = 2000
+http_session_headers = {
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
 
 help_text = ''' -- Jira integration CLI --
 cue x <command from query definition>
    run query, update content in results, update queue
 cue c <issue reference>
    see issue details
+cue s <keywords> [--local] [--project UI]
+   search issues by text, --local searches the cached issues only
 cue ls
    see queue
 cue q
    step through queue and remove items when done
+cue watch
+   keep refreshing the active queries on their 'interval' (minutes) and alert when the queue grows
+cue (REPL) jobs | cancel [job id]
+   x, xq and s run in the background in the REPL, add '&' to run any command there, list and cancel them
+cue <command> --timings [--trace trace.json]
+   print where the time went, optionally write a trace for chrome://tracing or Perfetto
 '''
 
 issue_ref_re = re.compile(r"[a-zA-Z]+-\d+")
 sprint_re = re.compile(r'(?<=name=).+?(?=,)')
 digits_re = re.compile(r'\d+')
+whitespace_re = re.compile(r'\s+')
+order_by_re = re.compile(r'\s+order\s+by\s+.*$', re.IGNORECASE | re.DOTALL)
@@ -1,9 +1,12 @@
-import traceback
 import shlex
 from cmd import Cmd
 import os
 import sys
-import webbrowser
+import threading
+try:
+    import readline
+except ImportError:
+    readline = None
 
 from quickparse import QuickParse
 
@@ -13,6 +16,19 @@ from lib import *
 def init():
     init_lib()
 
+def execute_cli(cli_args = None):
+    execute_quickparse(QuickParse(commands_config, options_config=options_config, cli_args=cli_args))
+
+def execute_quickparse(quickparse):
+    # the config is read only by the commands that need it, 'h' and 'o' don't
+    if not (len(quickparse.commands) > 0 and quickparse.commands[0] in config_free_command_names):
+        init()
+    with command_timings(quickparse), command_response_cache(quickparse):
+        quickparse.execute()
+
+def is_background_command(quickparse):
+    return len(quickparse.commands) > 0 and quickparse.commands[0] in background_command_names and '--local' not in quickparse.options
+
 def exit_cue():
     raise EOFError()
 
@@ -37,70 +53,60 @@ def execute_command(quickparse):
     unknown_query_names = [query_name for query_name in incoming_query_names if query_name not in all_query_names]
     assert len(unknown_query_names) == 0, f"Unknown query names: {', '.join(unknown_query_names)}"
     if '--all' in quickparse.options:
-        query_names = set(active_query_names)
-        query_names.update(incoming_query_names)
+        query_names = [query_name for query_name in all_query_names if query_name in active_query_names or query_name in incoming_query_names]
     else:
         query_names = incoming_query_names
-    for query_name in query_names:
-        stored_issues = get_stored_issues_for_query(query_name)
-        if len(stored_issues) == 0 or '--refresh' in quickparse.options:
-            query_title, jql = get_query(query_name)
-            # TODO: make extra params work with multiple query names
-            issues = search_issues(add_extra_params(jql, quickparse))
-            update_queue(query_title, get_updated_issues(issues, stored_issues))
-            write_issues(query_title, issues)
-        else:
-            issues = stored_issues
+    # fetches run in parallel, results are committed and printed one by one in query order
+    for query_title, stored_issues, issues, query_sync in fetch_queries_issues(query_names, quickparse):
+        commit_query_issues(query_title, stored_issues, issues, query_sync)
         if len(issues) > 0:
-            update_all_issues_cache(issues)
-            print(issues.format(variant=get_format_option(quickparse), add_colors=sys.stdout.isatty(), add_separator_to_multiline=sys.stdout.isatty(), expand_links=True, align_field_separator = True))
+            print_issues(issues.to_list(), variant=get_format_option(quickparse), add_colors=sys.stdout.isatty(), add_separator_to_multiline=sys.stdout.isatty(), expand_links=True, align_field_separator = True)
         else:
             print(f"{query_title}: no issues found")
 
 def execute_query(quickparse):
     assert len(quickparse.parameters) > 0, 'Query expected'
     assert len(quickparse.parameters) == 1, 'Too many parameters'
-    issues = search_issues(quickparse.parameters[0])
-    update_all_issues_cache(issues)
-    print(issues.format(variant=get_format_option(quickparse), add_colors=sys.stdout.isatty(), add_separator_to_multiline=sys.stdout.isatty(), expand_links=True, align_field_separator = True))
+    print_search_issues(quickparse.parameters[0], variant=get_format_option(quickparse), add_colors=sys.stdout.isatty(), add_separator_to_multiline=sys.stdout.isatty(), expand_links=True, align_field_separator = True)
 
 def search_issues_by_text(quickparse):
     assert len(quickparse.parameters) > 0, 'Keywords are expected'
     keywords = ' '.join(quickparse.parameters)
+    if '--local' in quickparse.options:
+        issues = search_cached_issues(keywords, project=quickparse.options.get('--project'))
+        print_issues(list(issues.values()), variant=get_format_option(quickparse), add_colors=sys.stdout.isatty(), add_separator_to_multiline=sys.stdout.isatty(), expand_links=True, align_field_separator = True, fetch_missing_fields=False)
+        return
     jql = f'text ~ "{keywords}"'
     if '--project' in quickparse.options:
         jql += f" and project={quickparse.options['--project'].upper()}"
-    issues = search_issues(jql)
-    update_all_issues_cache(issues)
-    print(issues.format(variant=get_format_option(quickparse), add_colors=sys.stdout.isatty(), add_separator_to_multiline=sys.stdout.isatty(), expand_links=True, align_field_separator = True))
+    print_search_issues(jql, variant=get_format_option(quickparse), add_colors=sys.stdout.isatty(), add_separator_to_multiline=sys.stdout.isatty(), expand_links=True, align_field_separator = True)
 
 def show_issue(quickparse):
     assert len(quickparse.parameters) >= 1, f"Issue reference is missing"
     jira_issue_refs = [convert_to_issue_ref(ref) for ref in quickparse.parameters]
+    fields = get_listing_fields(get_format_option(quickparse))
     if '--refresh' in quickparse.options:
-        issues = get_jira_issues(jira_issue_refs)
+        issues = get_jira_issues(jira_issue_refs, fields=fields)
     else:
-        cache_issues = JiraIssues().update(load_all_issues_cache()).filter(jira_issue_refs)
+        cache_issues = get_cached_issues(jira_issue_refs)
         new_issue_refs = [issue_ref for issue_ref in jira_issue_refs if issue_ref not in cache_issues]
         new_issues = JiraIssues()
         if len(new_issue_refs) > 0:
-            new_issues = get_jira_issues(jira_issue_refs)
+            new_issues = get_jira_issues(new_issue_refs, fields=fields)
         issues = JiraIssues().update(cache_issues).update(new_issues)
-    update_all_issues_cache(issues)
-    print(issues.format(variant=get_format_option(quickparse), add_colors=sys.stdout.isatty(), add_separator_to_multiline=sys.stdout.isatty(), expand_links=True, align_field_separator = True))
+    print_issues(issues.to_list(), variant=get_format_option(quickparse), add_colors=sys.stdout.isatty(), add_separator_to_multiline=sys.stdout.isatty(), expand_links=True, align_field_separator = True)
 
 def open_issue_in_browser(quickparse):
     assert len(quickparse.parameters) >= 1, f"Issue reference is missing"
+    import webbrowser
     for ref in (convert_to_issue_ref(ref) for ref in quickparse.parameters):
         webbrowser.open(f"https://jira.playtech.com/browse/{ref}")
 
 # TODO: outoging requests have all possible query params even those without value - remove them
 # TODO: add a command to list all queries
-# TODO: add a command to update all queries that are older than a certain time and not passive
 # TODO: truncate output at the end of the line
 # TODO: match column widths in output
 # TODO: save parametrised queries together with parameters
-# TODO: save query results only as keys and put the issues in the registry
 # TODO: show the issue count at the end of the query
 # TODO: show the time of the request at the end of the query
 # TODO: add query for epics that are not in the right state to their child issues
@@ -120,6 +126,7 @@ commands_config = {
     ('q', 'queue'): step_through_queue,
     ('a', 'alert'): alert_if_queue_not_empty,
     ('o', 'open'): open_issue_in_browser,
+    ('w', 'watch'): watch_queries,
 }
 
 options_config = (
@@ -130,11 +137,69 @@ options_config = (
     ('-r', '--refresh'),
     ('-p', '--project', str),
     ('-x', '--extra', str),
+    ('-L', '--local'),
+    ('-t', '--timings'),
+    ('--trace', str),
 )
 
 
 class CueREPL(Cmd):
 
+    def __init__(self):
+        super().__init__()
+        # network bound commands run as background jobs, their output is shown when they finish
+        from jobs import JobRunner
+        self.job_runner = JobRunner(self.show_finished_job)
+        self.finished_jobs = list()
+        self.finished_jobs_lock = threading.Lock()
+        self.is_busy = False
+
+    def show_finished_job(self, job):
+        with self.finished_jobs_lock:
+            self.finished_jobs.append(job)
+            if self.is_busy is True:
+                return
+        self.print_finished_jobs()
+        if readline is not None:
+            sys.stdout.write(f"{self.prompt}{readline.get_line_buffer()}")
+            sys.stdout.flush()
+
+    def print_finished_jobs(self):
+        with self.finished_jobs_lock:
+            finished_jobs = self.finished_jobs
+            self.finished_jobs = list()
+        for job in finished_jobs:
+            errors = job.errors.getvalue() if job.state == 'failed' else ''
+            sys.stdout.write(f"\n[{job.id}] {job.state} in {job.elapsed:.1f}s: {job.command}\n{job.output.getvalue()}{errors}")
+        sys.stdout.flush()
+
+    def precmd(self, line):
+        with self.finished_jobs_lock:
+            self.is_busy = True
+        return line
+
+    def postcmd(self, stop, line):
+        with self.finished_jobs_lock:
+            self.is_busy = False
+        self.print_finished_jobs()
+        return stop
+
+    def do_jobs(self, inp):
+        jobs = self.job_runner.get_jobs()
+        for job in jobs:
+            print(job)
+        if len(jobs) == 0:
+            print("No background jobs")
+        self.job_runner.forget_finished()
+
+    def do_cancel(self, inp):
+        try:
+            job_ids = [int(job_id) for job_id in inp.split()] or [job.id for job in self.job_runner.get_jobs() if job.state == 'running']
+            for job_id in job_ids:
+                print(f"Cancelling {self.job_runner.cancel(job_id)}")
+        except (AssertionError, ValueError) as e:
+            print(f'{e}')
+
     def cmdloop(self, intro=None):
         while True:
             try:
@@ -152,7 +217,16 @@ class CueREPL(Cmd):
 
     def default(self, inp):
         try:
-            QuickParse(commands_config, options_config=options_config, cli_args=shlex.split(inp)).execute()
+            cli_args = shlex.split(inp)
+            force_background = len(cli_args) > 0 and cli_args[-1] == '&'
+            if force_background is True:
+                cli_args = cli_args[:-1]
+            quickparse = QuickParse(commands_config, options_config=options_config, cli_args=cli_args)
+            if force_background is True or is_background_command(quickparse):
+                job = self.job_runner.start(' '.join(cli_args), lambda: execute_quickparse(quickparse))
+                print(f"[{job.id}] started: {job.command}")
+            else:
+                execute_quickparse(quickparse)
         except AssertionError as ae:
             print(f'{ae}')
         except EOFError as ee:
@@ -161,17 +235,18 @@ class CueREPL(Cmd):
         except KeyboardInterrupt:
             print(f'^C')
         except:
+            import traceback
             traceback.print_exc()
         return False
 
 
 if __name__ == '__main__':
-    try:
-        init()
-    except AssertionError as ae:
-        print(f'{ae}')
-        exit()
     if len(sys.argv) == 1:
+        try:
+            init()
+        except AssertionError as ae:
+            print(f'{ae}')
+            exit()
         if SCRIPT_PATH is not None:
             os.chdir(SCRIPT_PATH)
         cuerepl = CueREPL()
@@ -186,6 +261,8 @@ if __name__ == '__main__':
                 nothing_worse_than_keyboardinterrupt = True
     else:
         try:
-            QuickParse(commands_config, options_config=options_config).execute()
+            execute_cli()
         except AssertionError as ae:
             print(f'{ae}')
+            # scripts and the load test tell a failed command by its exit code
+            sys.exit(1)
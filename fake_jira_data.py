@@ -0,0 +1,110 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+
+fake_jira_base_url = 'https://jira.example.com/'
+fake_project_keys = ('UI', )
+fake_issue_types = ('Story', 'Bug', 'Task', 'Sub-task', 'Epic')
+fake_statuses = ('Backlog', 'Open', 'In Progress', 'In Review', 'Merge To Master DOING', 'Resolved', 'Closed')
+fake_resolutions = (None, None, None, 'Done', 'Won\'t Do', 'Duplicate')
+fake_users = tuple(f"user.{name}" for name in ('anna', 'bela', 'csaba', 'dora', 'erik', 'flora', 'gabor', 'hanna', 'ivan', 'jozsef', 'kata', 'lili'))
+fake_labels = ('UI42', 'A42', 'dev_regression', 'no_reg', 'nathan_mo_4_35', 'frontend', 'tech_debt', 'hotfix', 'ux')
+fake_target_versions = ('4_34_FE', '4_35', '4_35_FE', '4_36', None)
+fake_words = ('update', 'lobby', 'button', 'layout', 'broken', 'when', 'player', 'balance', 'missing', 'translation', 'slow', 'dialog', 'mobile', 'table', 'history', 'filter', 'crash', 'login', 'cashier', 'banner')
+fake_sprint_count = 40
+fake_created_start = datetime(2019, 1, 7, 9, 0, tzinfo=timezone.utc)
+
+
+def get_fake_user(name):
+    if name is None:
+        return None
+    return {
+        'self': f"{fake_jira_base_url}rest/api/2/user?username={name}",
+        'name': name,
+        'key': name,
+        'emailAddress': f"{name}@example.com",
+        'avatarUrls': {size: f"{fake_jira_base_url}secure/useravatar?size={size}&ownerId={name}" for size in ('48x48', '24x24', '16x16', '32x32')},
+        'displayName': name.split('.')[-1].title(),
+        'active': True,
+        'timeZone': 'Europe/Budapest',
+    }
+
+def get_fake_named_object(name, object_type, object_id):
+    if name is None:
+        return None
+    return {
+        'self': f"{fake_jira_base_url}rest/api/2/{object_type}/{object_id}",
+        'id': str(object_id),
+        'description': '',
+        'iconUrl': f"{fake_jira_base_url}images/icons/{object_type}/{object_id}.png",
+        'name': name,
+    }
+
+def get_fake_sprint(sprint_number):
+    start = fake_created_start + timedelta(days=14 * sprint_number)
+    state = 'CLOSED' if sprint_number < fake_sprint_count - 2 else 'ACTIVE' if sprint_number == fake_sprint_count - 2 else 'FUTURE'
+    return (f"com.atlassian.greenhopper.service.sprint.Sprint@{0x1a2b3c + sprint_number:x}[id={1000 + sprint_number},rapidViewId=42,state={state},"
+            f"name=UI Sprint {sprint_number},startDate={start.isoformat()},endDate={(start + timedelta(days=14)).isoformat()},"
+            f"completeDate=<null>,sequence={1000 + sprint_number},goal=]")
+
+def format_fake_timestamp(value):
+    return f"{value.strftime('%Y-%m-%dT%H:%M:%S')}.000+0000"
+
+def generate_fake_issue(issue_number, *, seed = 0, revision = 0, project_key = 'UI', fields = None):
+    # the same number, seed and revision always give the same issue, a new revision changes a few fields
+    rng = random.Random(f"{seed}-{issue_number}")
+    issue_type = rng.choice(fake_issue_types)
+    created = fake_created_start + timedelta(minutes=rng.randrange(0, 60 * 24 * 365 * 2))
+    updated = created + timedelta(minutes=rng.randrange(0, 60 * 24 * 60) + revision * 17)
+    first_sprint = rng.randrange(0, fake_sprint_count)
+    sprint_count = rng.choice((0, 1, 1, 2, 3))
+    time_spent = rng.choice((None, rng.randrange(0, 40) * 1800))
+    key = f"{project_key}-{issue_number}"
+    revision_rng = random.Random(f"{seed}-{issue_number}-{revision}")
+    all_fields = {
+        'summary': ' '.join(rng.choice(fake_words) for _ in range(rng.randrange(3, 12))).capitalize(),
+        'issuetype': get_fake_named_object(issue_type, 'issuetype', fake_issue_types.index(issue_type) + 1),
+        'assignee': get_fake_user(revision_rng.choice(fake_users + (None, ))),
+        'customfield_10104': [get_fake_sprint(sprint) for sprint in range(first_sprint, min(first_sprint + sprint_count, fake_sprint_count))] or None,
+        'project': {'self': f"{fake_jira_base_url}rest/api/2/project/10000", 'id': '10000', 'key': project_key, 'name': f"{project_key} project"},
+        'status': get_fake_named_object(revision_rng.choice(fake_statuses), 'status', 3),
+        'resolution': get_fake_named_object(rng.choice(fake_resolutions), 'resolution', 1),
+        'customfield_13621': rng.choice(fake_target_versions),
+        'customfield_11207': rng.choice((None, f"feature/{key}-{rng.choice(fake_words)}", f"bugfix/{key}\n  release/{key}")),
+        'creator': get_fake_user(rng.choice(fake_users)),
+        'created': format_fake_timestamp(created),
+        'updated': format_fake_timestamp(updated),
+        'labels': rng.sample(fake_labels, rng.randrange(0, 4)),
+        'description': '\n'.join(' '.join(rng.choice(fake_words) for _ in range(rng.randrange(5, 25))) for _ in range(rng.randrange(0, 8))) or None,
+        'timespent': time_spent,
+        'timeestimate': rng.choice((None, rng.randrange(0, 20) * 3600)),
+        'timeoriginalestimate': rng.choice((None, rng.randrange(1, 20) * 3600)),
+        'progress': {'progress': time_spent or 0, 'total': time_spent or 0},
+        'customfield_13613': rng.choice((None, 'Casino', 'Poker', 'Sports')),
+        'customfield_13611': rng.choice((None, '', f"FR-{rng.randrange(100, 999)}")),
+        'customfield_10100': None if issue_type in ('Epic', 'Sub-task') else rng.choice((None, f"{project_key}-{rng.randrange(1, max(2, issue_number))}")),
+        'customfield_10106': rng.choice((None, 1.0, 2.0, 3.0, 5.0, 8.0)),
+    }
+    if issue_type == 'Sub-task' and issue_number > 1:
+        all_fields['parent'] = {'id': str(issue_number - 1), 'key': f"{project_key}-{rng.randrange(1, issue_number)}"}
+    if fields is not None:
+        all_fields = {field: value for field, value in all_fields.items() if field in fields}
+    return {
+        'expand': 'operations,versionedRepresentations,editmeta,changelog,renderedFields',
+        'id': str(100000 + issue_number),
+        'self': f"{fake_jira_base_url}rest/api/2/issue/{100000 + issue_number}",
+        'key': key,
+        'fields': all_fields,
+    }
+
+def generate_fake_issues(issue_count, *, seed = 0, revision = 0, first_issue_number = 1):
+    return [generate_fake_issue(issue_number, seed=seed, revision=revision) for issue_number in range(first_issue_number, first_issue_number + issue_count)]
+
+def generate_search_payload(issue_count, *, seed = 0, revision = 0, start_at = 0, max_results = None, total = None):
+    return {
+        'expand': 'names,schema',
+        'startAt': start_at,
+        'maxResults': max_results if max_results is not None else issue_count,
+        'total': total if total is not None else issue_count,
+        'issues': generate_fake_issues(issue_count, seed=seed, revision=revision, first_issue_number=start_at + 1),
+    }
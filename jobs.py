@@ -0,0 +1,136 @@
+import io
+import sys
+import time
+import threading
+import traceback
+import contextvars
+
+
+# the job whose work is running in the current thread, worker threads get it through submit_in_context()
+current_job = contextvars.ContextVar('current_job', default=None)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def check_cancelled():
+    # cancellation is cooperative, long running code calls this between requests and output lines
+    job = current_job.get()
+    if job is not None and job.cancel_event.is_set():
+        raise JobCancelled()
+
+def sleep(seconds):
+    # a cancelled job wakes up at once
+    job = current_job.get()
+    if job is None:
+        time.sleep(seconds)
+    elif job.cancel_event.wait(seconds):
+        raise JobCancelled()
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class JobOutput(object):
+    # stands in for sys.stdout/sys.stderr, writes of a background job go to the job's buffer
+
+    def __init__(self, stream, buffer_name):
+        self.stream = stream
+        self.buffer_name = buffer_name
+
+    def write(self, text):
+        job = current_job.get()
+        if job is None:
+            return self.stream.write(text)
+        return getattr(job, self.buffer_name).write(text)
+
+    def flush(self):
+        if current_job.get() is None:
+            self.stream.flush()
+
+    def isatty(self):
+        return self.stream.isatty()
+
+    def __getattr__(self, attr):
+        return getattr(self.stream, attr)
+
+
+class Job(object):
+
+    def __init__(self, job_id, command):
+        self.id = job_id
+        self.command = command
+        self.state = 'running'
+        self.started = time.monotonic()
+        self.finished = None
+        self.output = io.StringIO()
+        self.errors = io.StringIO()
+        self.cancel_event = threading.Event()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    def __str__(self):
+        return f"[{self.id}] {self.state:<9} {self.elapsed:7.1f}s  {self.command}"
+
+
+class JobRunner(object):
+    # an asyncio loop in a daemon thread schedules the jobs, the blocking work runs on the loop's executor
+
+    def __init__(self, on_finished, max_workers = 4):
+        # asyncio is imported here, the commands outside the REPL only need the cancellation helpers above
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        self.on_finished = on_finished
+        self.jobs = dict()
+        self.next_job_id = 1
+        self.lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cue-job'))
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        sys.stdout = JobOutput(sys.stdout, 'output')
+        sys.stderr = JobOutput(sys.stderr, 'errors')
+
+    def start(self, command, fn):
+        with self.lock:
+            job = Job(self.next_job_id, command)
+            self.jobs[job.id] = job
+            self.next_job_id += 1
+        self.loop.call_soon_threadsafe(self.loop.create_task, self.run(job, fn))
+        return job
+
+    async def run(self, job, fn):
+        context = contextvars.copy_context()
+        context.run(current_job.set, job)
+        try:
+            await self.loop.run_in_executor(None, context.run, fn)
+            job.state = 'done'
+        except JobCancelled:
+            job.state = 'cancelled'
+        except AssertionError as ae:
+            job.state = 'failed'
+            job.errors.write(f"{ae}\n")
+        except Exception:
+            job.state = 'failed'
+            job.errors.write(traceback.format_exc())
+        job.finished = time.monotonic()
+        self.on_finished(job)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        assert job is not None, f"No such job: {job_id}"
+        if job.state == 'running':
+            job.cancel_event.set()
+        return job
+
+    def get_jobs(self):
+        with self.lock:
+            return list(self.jobs.values())
+
+    def forget_finished(self):
+        with self.lock:
+            for job_id in [job_id for job_id, job in self.jobs.items() if job.state != 'running']:
+                del self.jobs[job_id]
@@ -0,0 +1,129 @@
+import codecs
+import json
+
+
+json_whitespace = ' \t\n\r'
+# what may follow a complete array item
+array_item_terminators = json_whitespace + ',]'
+
+# drop the consumed part of the buffer once it grows beyond this
+buffer_trim_size = 1 << 16
+
+
+class JsonArrayStream(object):
+    # yields the elements of one top level array of a json object while the document is still arriving,
+    # the rest of the document becomes available in 'document' once the iteration is finished
+
+    def __init__(self, chunks, array_key):
+        self.chunks = iter(chunks)
+        self.array_key = array_key
+        self.document = None
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._is_exhausted = False
+        self._consumed = False
+
+    def __iter__(self):
+        assert self._consumed is False, "Json stream can only be iterated once"
+        self._consumed = True
+        head = self._read_head()
+        if head is None:
+            self.document = self._decode_document(self._buffer)
+            return
+        position = 0
+        while True:
+            position = self._skip(position, json_whitespace + ',')
+            if position >= len(self._buffer):
+                if not self._read_chunk():
+                    raise json.JSONDecodeError('Unterminated array', self._buffer, position)
+                continue
+            if self._buffer[position] == ']':
+                position += 1
+                break
+            try:
+                item, end = self._json_decoder.raw_decode(self._buffer, position)
+            except json.JSONDecodeError:
+                if not self._read_chunk():
+                    raise
+                continue
+            if not self._is_exhausted and (end >= len(self._buffer) or self._buffer[end] not in array_item_terminators):
+                # a scalar may continue in the next chunk, '12.' decodes as 12 until the fraction arrives
+                self._read_chunk()
+                continue
+            yield item
+            position = end
+            if position > buffer_trim_size:
+                self._buffer = self._buffer[position:]
+                position = 0
+        while self._read_chunk():
+            pass
+        self.document = self._decode_document(f"{head}[]{self._buffer[position:]}")
+
+    def _read_chunk(self):
+        if self._is_exhausted:
+            return False
+        for chunk in self.chunks:
+            text = self._text_decoder.decode(chunk)
+            if len(text) > 0:
+                self._buffer += text
+                return True
+        self._buffer += self._text_decoder.decode(b'', final=True)
+        self._is_exhausted = True
+        return False
+
+    def _skip(self, position, characters):
+        while position < len(self._buffer) and self._buffer[position] in characters:
+            position += 1
+        return position
+
+    def _read_head(self):
+        # scans for '"<array_key>": [' on the top level of the object, returns the text before the '['
+        position = 0
+        depth = 0
+        in_string = False
+        string_start = None
+        last_string = None
+        expect_value_of = None
+        while True:
+            if position >= len(self._buffer):
+                if not self._read_chunk():
+                    return None
+                continue
+            character = self._buffer[position]
+            if in_string:
+                if character == '\\':
+                    if position + 1 >= len(self._buffer):
+                        if not self._read_chunk():
+                            return None
+                        continue
+                    position += 2
+                    continue
+                if character == '"':
+                    in_string = False
+                    last_string = self._buffer[string_start:position + 1]
+            elif character == '"':
+                in_string = True
+                string_start = position
+                expect_value_of = None
+            elif character == ':':
+                expect_value_of = last_string if depth == 1 else None
+            elif character in '{[':
+                if character == '[' and expect_value_of is not None and json.loads(expect_value_of) == self.array_key:
+                    head = self._buffer[:position]
+                    self._buffer = self._buffer[position + 1:]
+                    return head
+                depth += 1
+                expect_value_of = None
+            elif character in '}]':
+                depth -= 1
+                expect_value_of = None
+            elif character not in json_whitespace:
+                expect_value_of = None
+            position += 1
+
+    def _decode_document(self, text):
+        document = json.loads(text)
+        assert isinstance(document, dict), f"Json object expected, got: {type(document).__name__}"
+        document.setdefault(self.array_key, list())
+        return document
@@ -1,20 +1,26 @@
 import json
-import requests
 import urllib.parse
-import yaml
-import toml
-import dateutil.parser
 import re
 import os
 import sys
-import subprocess
-import platform
+import threading
+import math
+import time
+import contextvars
+from datetime import datetime, timezone
+from collections import deque
+from contextlib import contextmanager
 
+import jobs
+import timings
 from const import *
+from store import IssueStore
+from queue_store import QueueStore
+from response_cache import ResponseCache, get_cache_key
+from request_scheduler import RequestScheduler, parse_retry_after, get_retry_backoff
+from jsonstream import JsonArrayStream
 
 
-req = requests.models.PreparedRequest()
-
 jira_instance_url = None
 jira_request_headers = None
 queries_definition_file = None
@@ -22,131 +28,314 @@ result_files_dir = None
 alert_sound_file = None
 all_issues_file = None
 all_issues_cache = None
+issue_store_file = None
+issue_store = None
+loaded_files = dict()
+query_index = None
+config_lock = threading.RLock()
+render_plans = dict()
+issue_fetches_lock = threading.RLock()
+issue_fetches_in_flight = dict()
+issue_fetch_executor = None
+cache_lock = threading.RLock()
+query_commit_locks = dict()
+search_page_size = None
+search_page_workers = None
+http_pool_connections = None
+http_pool_maxsize = None
+http_session = None
+query_workers = None
+stream_responses = None
+watch_interval_minutes = None
+response_cache_file = None
+response_cache_ttl_minutes = None
+response_cache_max_mb = None
+response_cache = None
+queue_store_file = None
+queue_store = None
+request_max_concurrency = None
+request_max_retries = None
+request_scheduler = None
+# how old a cached response the current command or query accepts in seconds, 0 always asks the server, None is the configured default
+response_cache_ttl = contextvars.ContextVar('response_cache_ttl', default=None)
+
+
+# requests, yaml, dateutil and the like are imported where they are first needed,
+# so the commands answered from local files ('ls', 'a', 'q', 'o') start without them
+
+def parse_jira_datetime(value):
+    # Jira sends '2020-08-12T10:15:30.000+0100', fromisoformat only needs a colon in the offset
+    if len(value) == 28 and value[23] in '+-':
+        try:
+            return datetime.fromisoformat(f"{value[:26]}:{value[26:]}")
+        except ValueError:
+            pass
+    import dateutil.parser
+    return dateutil.parser.parse(value)
+
+def format_duration(seconds):
+    return f"{seconds // 3600}:{(seconds % 3600) // 60:02}" if seconds is not None else ""
+
+def intern_name(value):
+    return sys.intern((value or '').strip())
+
+
+def get_core_data_missing_fields(core_data):
+    data_keys = tuple(core_data)
+    missing_fields = core_data_missing_fields.get(data_keys)
+    if missing_fields is None:
+        present_fields = set(field for key in data_keys for field in issue_attr_fields.get(key, tuple()))
+        missing_fields = core_data_missing_fields[data_keys] = issue_source_fields - present_fields
+    return missing_fields
+
+def get_listing_attrs(variant):
+    fields_definitions = issue_fields_by_variant.get(variant, issue_fields_by_variant['compact'])
+    return tuple(dict.fromkeys(fields[0] for fields_definition in fields_definitions for fields in fields_definition))
+
+def get_issue_fields(attrs):
+    return tuple(dict.fromkeys(field for attr in attrs for field in issue_attr_fields.get(attr, tuple())))
+
+def get_listing_fields(variant):
+    return get_issue_fields(get_listing_attrs(variant))
+
+def get_listing_link_attrs(variant):
+    return tuple(attr for attr in get_listing_attrs(variant) if attr in issue_link_fields)
+
+def compile_render_plan(fields_definition, *, add_colors = True, centered = True, expand_links = True, align_field_separator = False):
+    render_plan = list()
+    for fields in fields_definition:
+        if len(fields) == 4:
+            key, width, default, color = fields
+            field_name_color = None
+            insert_field_name = False
+        elif len(fields) == 5:
+            key, width, default, color, field_name_color = fields
+            insert_field_name = True
+        else:
+            raise AssertionError(f"Field definition item is invalid: {fields}")
+        color_switchers = tuple()
+        if isinstance(color, (tuple, list)):
+            color, color_switchers = color
+            color_switchers = tuple(color_switchers.items()) if add_colors is True else tuple()
+        if add_colors is True and color is not None:
+            color_prefix, color_suffix = color, CLR.reset
+        else:
+            color_prefix, color_suffix = '', ''
+        field_name_prefix = ''
+        if insert_field_name:
+            field_name = issue_display_names[key]
+            if align_field_separator is True:
+                field_name = f"{field_name:>{display_key_len}}"
+            if add_colors is False or field_name_color is None:
+                field_name_prefix = f"{field_name}: "
+            else:
+                field_name_prefix = f"{field_name_color}{field_name}{CLR.reset}: "
+        format_spec = f"{'^' if centered else ''}{width}" if width > 0 else ''
+        may_be_link = expand_links is True and key in issue_link_fields
+        render_plan.append((key, width, format_spec, default, color_prefix, color_suffix, color_switchers, may_be_link, field_name_prefix))
+    return tuple(render_plan)
+
+def get_render_plan(fields_definition, *, add_colors = True, centered = True, expand_links = True, align_field_separator = False):
+    # field definitions are module level constants so their identity is a stable cache key
+    plan_key = (id(fields_definition), add_colors, centered, expand_links, align_field_separator)
+    render_plan = render_plans.get(plan_key)
+    if render_plan is None:
+        render_plan = render_plans[plan_key] = compile_render_plan(fields_definition, add_colors=add_colors, centered=centered, expand_links=expand_links, align_field_separator=align_field_separator)
+    return render_plan
+
+
+# the fields an issue built from core data has, by the core data keys it was stored with
+core_data_missing_fields = dict()
 
 
 class JiraIssue(object):
 
-    def __init__(self, issue_obj):
+    # values shown in listings are kept as is, everything derived from them is computed on first access
+    __slots__ = (
+        'key', 'title', 'type', 'assignee', 'status', 'resolution', 'target_version', 'creator', 'project', 'fr', 'epic', 'story_points', 'parent',
+        'time_spent', 'estimate', 'original_estimate', 'progress',
+        'url', 'git_branches', 'created', 'created_str', 'updated', 'updated_str', 'labels', 'labels_str', 'description',
+        'time_spent_str', 'estimate_str', 'original_estimate_str', 'sprints', 'last_sprint', 'sprints_str', 'core_data', 'missing_fields',
+        '_created_raw', '_updated_raw', '_labels_raw', '_git_branches_raw', '_description_raw', '_sprints_raw',
+    )
+
+    def __init__(self, issue_obj, requested_fields = requested_issue_fields):
         if 'fields' in issue_obj:
-            self.raw_data = issue_obj
             fields = issue_obj['fields']
-            sprints = list()
-            for sprint in (fields['customfield_10104'] or tuple()):
-                hit = sprint_re.search(sprint)
-                if hit is not None:
-                    sprints.append(hit.group())
-            assert fields['project']['key'] == 'UI', f"Can't process a non-UI ticket, found '{fields['project']['key']}'"
-            self.data = {
-                'key': issue_obj['key'],
-                'url': urllib.parse.urljoin(jira_instance_url, f"/browse/{issue_obj['key']}"),
-                'title': (fields['summary'] or '').strip(),
-                'type': (fields['issuetype']['name'] or '').strip(),
-                'assignee': (fields['assignee']['name'] or '').strip() if fields['assignee'] is not None else '',
-                'status': (fields['status']['name'] or '').strip(),
-                'resolution': (fields['resolution']['name'] or '').strip() if fields['resolution'] is not None else '',
-                'target_version': (fields['customfield_13621'] or '').strip(),
-                'git_branches': re.sub(r'\s+', ' ', fields['customfield_11207'] or '').strip(),
-                'creator': (fields['creator']['name'] or '').strip(),
-                'created': dateutil.parser.parse(fields['created']),
-                'created_str': dateutil.parser.parse(fields['created']).strftime('%m-%b-%Y'),
-                'updated': dateutil.parser.parse(fields['updated']),
-                'updated_str': dateutil.parser.parse(fields['updated']).strftime('%m-%b-%Y'),
-                'labels': sorted(fields['labels']),
-                'labels_str': f"{', '.join(label.strip() for label in fields['labels'])}",
-                'description': re.sub(r'\s+', ' ', (fields['description'] or '').strip()),
-                'time_spent': fields['timespent'],
-                'time_spent_str': f"{fields['timespent'] // 3600}:{(fields['timespent'] % 3600) // 60:02}" if fields['timespent'] is not None else "",
-                'estimate': fields['timeestimate'],
-                'estimate_str': f"{fields['timeestimate'] // 3600}:{(fields['timeestimate'] % 3600) // 60:02}" if fields['timeestimate'] is not None else "",
-                'original_estimate': fields['timeoriginalestimate'],
-                'original_estimate_str': f"{fields['timeoriginalestimate'] // 3600}:{(fields['timeoriginalestimate'] % 3600) // 60:02}" if fields['timeoriginalestimate'] is not None else "",
-                'progress': fields['progress'],
-                'project': (fields['customfield_13613'] or '').strip(),
-                'fr': (fields['customfield_13611'] or '').strip(),
-                'epic': (fields['customfield_10100'] or '').strip(),
-                'story_points': str(fields['customfield_10106'] or ''),
-                'sprints': sprints,
-                'last_sprint': sprints[-1] if len(sprints) > 0 else '',
-                'sprints_str': ', '.join(sprints),
-                'parent': fields.get('parent', dict()).get('key', ''),
-            }
+            self.key = issue_obj['key']
+            project_key = fields['project']['key'] if 'project' in fields else self.key.split('-')[0]
+            assert project_key == 'UI', f"Can't process a non-UI ticket, found '{project_key}'"
+            if 'parent' not in fields and 'parent' in requested_fields:
+                # Jira leaves the parent out of the issues that have none, even when it is asked for
+                fields['parent'] = None
+            # an issue fetched with some of the fields only gets the attributes of those
+            self.missing_fields = issue_source_fields.difference(fields)
+            if 'summary' in fields:
+                self.title = (fields['summary'] or '').strip()
+            if 'issuetype' in fields:
+                self.type = intern_name(fields['issuetype']['name'])
+            if 'assignee' in fields:
+                self.assignee = intern_name(fields['assignee']['name']) if fields['assignee'] is not None else ''
+            if 'status' in fields:
+                self.status = intern_name(fields['status']['name'])
+            if 'resolution' in fields:
+                self.resolution = intern_name(fields['resolution']['name']) if fields['resolution'] is not None else ''
+            if 'customfield_13621' in fields:
+                self.target_version = intern_name(fields['customfield_13621'])
+            if 'creator' in fields:
+                self.creator = intern_name(fields['creator']['name'])
+            if 'customfield_13613' in fields:
+                self.project = intern_name(fields['customfield_13613'])
+            if 'customfield_13611' in fields:
+                self.fr = (fields['customfield_13611'] or '').strip()
+            if 'customfield_10100' in fields:
+                self.epic = intern_name(fields['customfield_10100'])
+            if 'customfield_10106' in fields:
+                self.story_points = str(fields['customfield_10106'] or '')
+            if 'parent' in fields:
+                self.parent = (fields['parent'] or dict()).get('key', '')
+            self.time_spent = fields.get('timespent')
+            self.estimate = fields.get('timeestimate')
+            self.original_estimate = fields.get('timeoriginalestimate')
+            self.progress = fields.get('progress')
+            self._created_raw = fields.get('created')
+            self._updated_raw = fields.get('updated')
+            self._labels_raw = fields.get('labels')
+            self._git_branches_raw = fields.get('customfield_11207')
+            self._sprints_raw = fields.get('customfield_10104')
+            if 'description' in fields:
+                self._description_raw = fields['description']
+            else:
+                # not fetched, like with the issues built from core data
+                self.description = None
             # TODO: add progress status, attachments
             # TODO: add a field as how old the data is
             # TODO: process non-UI tickets
-            # TODO: parent issue doesn't come up for sub-tasks
-            self.core_data = {key: self.data[key] for key, value in issue_display_keys}
-            self.core_data['key'] = self.data['key']
         else:
-            self.raw_data = self.core_data = dict(issue_obj)
-            data = dict(issue_obj)
-            data['sprints'] = [sprint.strip() for sprint in data['sprints_str'].split(',')]
-            data['last_sprint'] = data['sprints'][-1] if len(data['sprints']) > 0 else ''
-            self.data = data
+            for raw_attr in ('_created_raw', '_updated_raw', '_labels_raw', '_git_branches_raw', '_description_raw', '_sprints_raw'):
+                setattr(self, raw_attr, None)
+            # the description is not part of the core data, None tells it apart from an empty one
+            self.description = None
+            for attr, value in issue_obj.items():
+                setattr(self, attr, intern_name(value) if attr in interned_issue_fields else value)
+            if 'sprints_str' in issue_obj:
+                self.sprints = [sys.intern(sprint.strip()) for sprint in issue_obj['sprints_str'].split(',')]
+            self.missing_fields = get_core_data_missing_fields(issue_obj)
+            self.core_data = dict(issue_obj)
 
     def __getattr__(self, attr):
-        if attr in self.data:
-            return self.data[attr]
-        elif attr in self.core_data:
-            return self.core_data[attr]
-        else:
-            raise KeyError(attr)
+        if self.missing_fields and not self.missing_fields.isdisjoint(issue_attr_fields.get(attr, tuple())):
+            # one request for one issue, listings fill their issues in batches before they get here
+            timings.count('single issue fills')
+            fill_issue_fields((self, ), (attr, ))
+            assert self.missing_fields.isdisjoint(issue_attr_fields[attr]), f"Can't get the {attr} of {self.key}, the issue was not found"
+            return getattr(self, attr)
+        getter = getattr(type(self), f"_get_{attr}", None)
+        if getter is None:
+            raise AttributeError(attr)
+        value = getter(self)
+        setattr(self, attr, value)
+        return value
+
+    def fill(self, issue):
+        # takes the fields this issue was fetched without from another copy of it
+        filled_fields = self.missing_fields - issue.missing_fields
+        if len(filled_fields) == 0:
+            return
+        for attr, fields in issue_attr_fields.items():
+            if filled_fields.issuperset(fields):
+                try:
+                    setattr(self, attr, getattr(issue, attr))
+                except AttributeError:
+                    # a copy built from core data has the shown values only, e.g. 'time_spent_str' without 'time_spent'
+                    pass
+        self.missing_fields = self.missing_fields - filled_fields
+        self.core_data = self._get_core_data()
+
+    def _get_core_data(self):
+        core_data = {key: getattr(self, key) for key, value in issue_display_keys if self.missing_fields.isdisjoint(issue_attr_fields.get(key, tuple()))}
+        core_data['key'] = self.key
+        return core_data
+
+    def _get_url(self):
+        return urllib.parse.urljoin(jira_instance_url, f"/browse/{self.key}")
+
+    def _get_git_branches(self):
+        return whitespace_re.sub(' ', self._git_branches_raw or '').strip()
+
+    def _get_description(self):
+        return ' '.join((self._description_raw or '').split())
+
+    def _get_created(self):
+        return parse_jira_datetime(self._created_raw) if self._created_raw is not None else None
+
+    def _get_created_str(self):
+        return self.created.strftime('%m-%b-%Y') if self.created is not None else ''
+
+    def _get_updated(self):
+        return parse_jira_datetime(self._updated_raw) if self._updated_raw is not None else None
+
+    def _get_updated_str(self):
+        return self.updated.strftime('%m-%b-%Y') if self.updated is not None else ''
+
+    def _get_labels(self):
+        return sorted(self._labels_raw or tuple())
+
+    def _get_labels_str(self):
+        return ', '.join(label.strip() for label in (self._labels_raw or tuple()))
+
+    def _get_time_spent_str(self):
+        return format_duration(self.time_spent)
+
+    def _get_estimate_str(self):
+        return format_duration(self.estimate)
+
+    def _get_original_estimate_str(self):
+        return format_duration(self.original_estimate)
+
+    def _get_sprints(self):
+        sprints = list()
+        for sprint in (self._sprints_raw or tuple()):
+            hit = sprint_re.search(sprint)
+            if hit is not None:
+                sprints.append(sys.intern(hit.group()))
+        self._sprints_raw = None
+        return sprints
+
+    def _get_last_sprint(self):
+        return self.sprints[-1] if len(self.sprints) > 0 else ''
+
+    def _get_sprints_str(self):
+        return ', '.join(self.sprints)
 
     def __str__(self):
         return f"{self.key} - {self.title}"
 
     def _get_formatted_fields(self, fields_definition, *, add_colors = True, add_empty = True, centered = True, expand_links = True, align_field_separator = False):
-
-        def render_field(color, field_str, width, *, add_colors = True, centered = True):
-            if centered:
-                if add_colors and color is not None:
-                    return f"{color}{field_str:^{width}}{CLR.reset}" if width > 0 else ''
-                else:
-                    return f"{field_str:^{width}}" if width > 0 else ''
-            else:
-                if add_colors and color is not None:
-                    return f"{color}{field_str:{width}}{CLR.reset}" if width > 0 else ''
-                else:
-                    return f"{field_str:{width}}" if width > 0 else ''
-
         formatted_fields = list()
-        for fields in fields_definition:
-            if len(fields) == 4:
-                key, width, default, color = fields
-                insert_field_name = False
-            elif len(fields) == 5:
-                key, width, default, color, field_name_color = fields
-                insert_field_name = True
+        for key, width, format_spec, default, color_prefix, color_suffix, color_switchers, may_be_link, field_name_prefix in get_render_plan(fields_definition, add_colors=add_colors, centered=centered, expand_links=expand_links, align_field_separator=align_field_separator):
+            if self.missing_fields and not self.missing_fields.isdisjoint(issue_attr_fields.get(key, tuple())):
+                # a field the listing couldn't get shows up empty instead of being fetched for this issue alone
+                attr = ''
             else:
-                raise AssertionError(f"Field definition item is invalid: {fields}")
-            attr = getattr(self, key)
-            if not add_empty and not attr:
+                attr = getattr(self, key)
+            if not attr:
+                if not add_empty:
+                    continue
+                formatted_fields.append(f"{field_name_prefix}{color_prefix}{format(default, format_spec)}{color_suffix}" if width > 0 else field_name_prefix)
                 continue
-            attr = expand_issue_link(attr) if expand_links is True else attr
-            _width = width if width > 0 else len(attr)
-            field_str = ellipsis(attr, _width) if attr else default
-            if add_colors is True and isinstance(color, (tuple, list)):
-                default_color, color_switchers = color
-                formatted_field = render_field(default_color, field_str, _width, add_colors=add_colors, centered=centered)
-                for after_this, color_to_switch in color_switchers.items():
-                    switch_position = formatted_field.find(after_this)
-                    if switch_position >= 0:
-                        insert_at_index = switch_position + len(after_this)
-                        formatted_field = formatted_field[:insert_at_index] + color_to_switch + formatted_field[insert_at_index:]
+            if may_be_link:
+                attr = expand_issue_link(attr)
+            if width > 0:
+                formatted_field = f"{color_prefix}{format(ellipsis(attr, width), format_spec)}{color_suffix}"
             else:
-                formatted_field = render_field(color, field_str, _width, add_colors=add_colors, centered=centered)
-            if insert_field_name:
-                field_name = [item[1] for item in issue_display_keys if item[0] == key][0]
-                if align_field_separator is True:
-                    if add_colors is False or field_name_color is None:
-                        formatted_field = f"{field_name:>{display_key_len}}: {formatted_field}"
-                    else:
-                        formatted_field = f"{field_name_color}{field_name:>{display_key_len}}{CLR.reset}: {formatted_field}"
-                else:
-                    if add_colors is False or field_name_color is None:
-                        formatted_field = f"{field_name}: {formatted_field}"
-                    else:
-                        formatted_field = f"{field_name_color}{field_name}{CLR.reset}: {formatted_field}"
-            formatted_fields.append(formatted_field)
+                formatted_field = f"{color_prefix}{attr}{color_suffix}"
+            for after_this, color_to_switch in color_switchers:
+                switch_position = formatted_field.find(after_this)
+                if switch_position >= 0:
+                    insert_at_index = switch_position + len(after_this)
+                    formatted_field = formatted_field[:insert_at_index] + color_to_switch + formatted_field[insert_at_index:]
+            formatted_fields.append(f"{field_name_prefix}{formatted_field}")
         return formatted_fields
 
     def format_oneline(self, add_colors = True):
@@ -184,10 +373,11 @@ class JiraIssues(dict):
 
     def __init__(self, issues_data = None):
         super().__init__()
+        self.fingerprints = dict()
+        self.updated_timestamps = dict()
         if issues_data is None:
             return
-        assert isinstance(issues_data, (list, dict)), f"Unrecognised issues data: {issues_data}"
-        if isinstance(issues_data, list):
+        if not isinstance(issues_data, dict):
             for issue_obj in issues_data:
                 issue = JiraIssue(issue_obj)
                 self[issue.key] = issue
@@ -205,18 +395,7 @@ class JiraIssues(dict):
         return sorted(self.values(), key=lambda issue: int(issue.key.split('-')[1]))
 
     def format(self, *, variant = None, add_colors = True, expand_links = True, add_separator_to_multiline = True, align_field_separator = False):
-        if variant == 'oneline':
-            return '\n'.join(issue.format(variant=variant, add_colors=add_colors, expand_links=expand_links) for issue in self.to_list())
-        else:
-            formatted_issues = tuple(issue.format(variant=variant, add_colors=add_colors, expand_links=expand_links, align_field_separator=align_field_separator) for issue in self.to_list())
-            if add_separator_to_multiline is True and issue_fields_vertical_separator:
-                if add_colors is True and issue_fields_vertical_separator_color is not None:
-                    separator = f"{issue_fields_vertical_separator_color}{issue_fields_vertical_separator}{CLR.reset}"
-                else:
-                    separator = issue_fields_vertical_separator
-                return separator + '\n' + f"\n{separator}\n".join(formatted_issues) + '\n' + separator
-            else:
-                return '\n'.join(formatted_issues)
+        return ''.join(iter_formatted_issues(self.to_list(), variant=variant, add_colors=add_colors, expand_links=expand_links, add_separator_to_multiline=add_separator_to_multiline, align_field_separator=align_field_separator))[:-1]
 
     def filter(self, issure_refs):
         keys_to_remove = list()
@@ -234,92 +413,693 @@ class JiraIssues(dict):
         return self
 
 
+def iter_formatted_issues(issues, *, variant = None, add_colors = True, expand_links = True, add_separator_to_multiline = True, align_field_separator = False):
+    # yields one newline terminated block per issue so listings can be written while the issues are still arriving
+    separator = None
+    if variant != 'oneline' and add_separator_to_multiline is True and issue_fields_vertical_separator:
+        if add_colors is True and issue_fields_vertical_separator_color is not None:
+            separator = f"{issue_fields_vertical_separator_color}{issue_fields_vertical_separator}{CLR.reset}"
+        else:
+            separator = issue_fields_vertical_separator
+    if separator is not None:
+        yield f"{separator}\n"
+    is_empty = True
+    for issue in issues:
+        if separator is not None and is_empty is False:
+            yield f"{separator}\n"
+        with timings.span('format'):
+            if variant == 'oneline':
+                formatted_issue = f"{issue.format(variant=variant, add_colors=add_colors, expand_links=expand_links)}\n"
+            else:
+                formatted_issue = f"{issue.format(variant=variant, add_colors=add_colors, expand_links=expand_links, align_field_separator=align_field_separator)}\n"
+        yield formatted_issue
+        is_empty = False
+    if is_empty is True:
+        yield '\n'
+    if separator is not None:
+        yield f"{separator}\n"
+
+def print_issues(issues, *, variant = None, add_colors = True, expand_links = True, add_separator_to_multiline = True, align_field_separator = False, fetch_missing_fields = True):
+    link_attrs = get_listing_link_attrs(variant) if expand_links is True else tuple()
+    if fetch_missing_fields is False:
+        # an offline listing shows the stored fields and link titles only, the others are left empty
+        link_attrs = tuple()
+    elif isinstance(issues, list):
+        # cached issues may lack fields the variant shows, a listing at hand gets them in one go instead of one request per issue
+        fill_listed_issue_fields(issues, get_listing_attrs(variant))
+    else:
+        issues = iter_filled_issues(issues, get_listing_attrs(variant))
+    if len(link_attrs) > 0:
+        issues = iter_issues_with_links(issues, link_attrs)
+    for formatted_issue in iter_formatted_issues(issues, variant=variant, add_colors=add_colors, expand_links=expand_links, add_separator_to_multiline=add_separator_to_multiline, align_field_separator=align_field_separator):
+        jobs.check_cancelled()
+        with timings.span('output'):
+            sys.stdout.write(formatted_issue)
+    with timings.span('output'):
+        sys.stdout.flush()
+
+
+class SearchPage(object):
+
+    def __init__(self, issue_objs):
+        self.issue_objs = issue_objs
+        self.issue_count = 0
+        self.document = None
+
+    @classmethod
+    def from_document(cls, document):
+        page = cls(document['issues'])
+        page.document = document
+        return page
+
+    def __iter__(self):
+        # a streamed page returns the rest of the response document once its issues are consumed
+        issue_objs = iter(self.issue_objs)
+        while True:
+            try:
+                issue_obj = next(issue_objs)
+            except StopIteration as stop:
+                if stop.value is not None:
+                    self.document = stop.value
+                return
+            self.issue_count += 1
+            yield issue_obj
+
 def init_lib():
     get_user_config()
 
-def get_jira_data(url, *, query_params = None, headers = None):
-    query_params = dict(query_params)
-    query_params.update({'fields': ','.join(requested_issue_fields)})
+def get_http_session():
+    global http_session
+    if http_session is None:
+        import requests
+        # one keep-alive pool per process, pool_block caps the open connections per host
+        adapter = requests.adapters.HTTPAdapter(pool_connections=http_pool_connections, pool_maxsize=http_pool_maxsize, pool_block=True)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(http_session_headers)
+        http_session = session
+    return http_session
+
+def send_jira_request(url, *, query_params = None, headers = None, fields = requested_issue_fields, stream = False):
+    # every request is a search, so throttled and failed ones are sent again after a backoff or the server's Retry-After
+    import requests
+    query_params = dict(query_params or dict())
+    query_params.update({'fields': ','.join(fields)})
+    req = requests.models.PreparedRequest()
     req.prepare_url(url, query_params)
-    try:
-        print(f"Sending request: {req.url}")
-        resp = requests.get(url, params=query_params, headers=headers, allow_redirects=True, timeout=request_timeout_seconds)
-    except Exception as e:
-        raise AssertionError(str(e))
-    except KeyboardInterrupt:
-        raise AssertionError()
-    if resp.status_code != 200:
-        if resp.headers.get('X-Seraph-LoginReason') == 'AUTHENTICATED_FAILED':
-            raise AssertionError(f"HTTP Error: {resp.status_code} - {requests.status_codes._codes.get(resp.status_code, ['N/A'])[0]} > check login credentials")
-        elif resp.headers.get('X-Seraph-LoginReason') == 'AUTHENTICATION_DENIED':
-            raise AssertionError(f"HTTP Error: {resp.status_code} - {requests.status_codes._codes.get(resp.status_code, ['N/A'])[0]} > try a browser login, captcha authentication may have been triggered")
+    scheduler = get_request_scheduler()
+    for attempt in range(request_max_retries + 1):
+        started = scheduler.acquire()
+        try:
+            sys.stderr.write(f"{'Sending' if attempt == 0 else 'Retrying'} request: {req.url}\n")
+            timings.count('requests')
+            with timings.span('http request', url=req.url):
+                resp = get_http_session().get(url, params=query_params, headers=headers, allow_redirects=True, timeout=request_timeout_seconds, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            scheduler.release(started, throttled=True)
+            error, retry_after = str(e), None
+        except Exception as e:
+            scheduler.release(started)
+            raise AssertionError(str(e))
+        except KeyboardInterrupt:
+            scheduler.release(started)
+            raise AssertionError()
+        else:
+            scheduler.release(started, throttled=resp.status_code in throttle_status_codes)
+            if resp.status_code == 200:
+                return resp
+            timings.count(f"http {resp.status_code}")
+            resp.close()
+            error = get_http_error_message(resp)
+            if resp.headers.get('X-Seraph-LoginReason') in ('AUTHENTICATED_FAILED', 'AUTHENTICATION_DENIED'):
+                scheduler.halt(error)
+                raise AssertionError(error)
+            if resp.status_code not in retried_status_codes:
+                raise AssertionError(error)
+            retry_after = parse_retry_after(resp.headers.get('Retry-After'))
+        if attempt == request_max_retries:
+            raise AssertionError(f"{error} - gave up after {attempt + 1} attempts")
+        if retry_after is not None:
+            assert retry_after <= request_max_retry_after_seconds, f"{error} - the server asks to retry in {retry_after:.0f} s"
+            scheduler.pause(retry_after)
+            delay = retry_after
         else:
-            raise AssertionError(f"HTTP Error: {resp.status_code} - {requests.status_codes._codes.get(resp.status_code, ['N/A'])[0]}")
+            delay = get_retry_backoff(attempt, request_retry_base_seconds, request_retry_max_seconds)
+        timings.count('http retries')
+        sys.stderr.write(f"{error} - retry in {delay:.1f} s\n")
+        jobs.sleep(delay)
+
+def get_http_error_message(resp):
+    import requests
+    message = f"HTTP Error: {resp.status_code} - {requests.status_codes._codes.get(resp.status_code, ['N/A'])[0]}"
+    if resp.headers.get('X-Seraph-LoginReason') == 'AUTHENTICATED_FAILED':
+        return f"{message} > check login credentials"
+    elif resp.headers.get('X-Seraph-LoginReason') == 'AUTHENTICATION_DENIED':
+        return f"{message} > try a browser login, captcha authentication may have been triggered"
+    return message
+
+def get_request_scheduler():
+    global request_scheduler
+    with config_lock:
+        if request_scheduler is None:
+            request_scheduler = RequestScheduler(request_max_concurrency, initial_concurrency=request_initial_concurrency, latency_tolerance=request_latency_tolerance, decrease_factor=request_decrease_factor)
+        return request_scheduler
+
+def check_jira_errors(response_json):
+    if 'errorMessages' in response_json:
+        raise AssertionError(f"Error: {', '.join(response_json.get('errorMessages', ('unspecified', )))}")
+
+def count_response_bytes(resp):
+    if timings.is_enabled is True:
+        # the raw stream counts what came over the wire, before gzip decoding
+        timings.count('bytes received', resp.raw.tell())
+
+def get_jira_data(url, *, query_params = None, headers = None, fields = requested_issue_fields, cached_body = None):
+    resp = send_jira_request(url, query_params=query_params, headers=headers, fields=fields)
+    with timings.span('http read'):
+        content = resp.content
+    count_response_bytes(resp)
     try:
-        response_json = json.loads(resp.content)
+        with timings.span('json decode'):
+            response_json = json.loads(content)
     except Exception as e:
         raise AssertionError(f"Error while loading json: {e}")
-    if 'errorMessages' in response_json:
-        raise AssertionError(f"Error: {', '.join(response_json.get('errorMessages', ('unspecified', )))}")
+    check_jira_errors(response_json)
+    if cached_body is not None:
+        with timings.span('response cache write'):
+            cached_body.write(content)
+            cached_body.close()
     return response_json
 
-def search_issues(jql, *, maxResults = -1, startAt = None):
-    # TODO: limit maxResults
+def iter_response_chunks(resp):
+    try:
+        yield from timings.timed_iter('http read', resp.iter_content(chunk_size=stream_chunk_size))
+    except Exception as e:
+        raise AssertionError(str(e))
+    finally:
+        count_response_bytes(resp)
+        resp.close()
+
+def iter_jira_array(url, array_key, *, query_params = None, headers = None, fields = requested_issue_fields, cached_body = None):
+    # the array elements are decoded one by one as they arrive, the rest of the response is checked at the end
+    resp = send_jira_request(url, query_params=query_params, headers=headers, fields=fields, stream=True)
+    chunks = iter_response_chunks(resp)
+    if cached_body is not None:
+        chunks = iter_written(chunks, cached_body)
+    stream = JsonArrayStream(chunks, array_key)
+    try:
+        yield from timings.timed_iter('json decode', stream)
+    except json.JSONDecodeError as e:
+        raise AssertionError(f"Error while loading json: {e}")
+    check_jira_errors(stream.document)
+    if cached_body is not None:
+        with timings.span('response cache write'):
+            cached_body.close()
+    return stream.document
+
+def iter_written(chunks, body):
+    for chunk in chunks:
+        body.write(chunk)
+        yield chunk
+
+def get_search_page(jql, start_at, max_results, *, fields = requested_issue_fields):
     url = urllib.parse.urljoin(jira_instance_url, '/rest/api/2/search')
     query_params = {
         'jql': jql,
-        'maxResults': maxResults,
+        'startAt': start_at,
+        'maxResults': max_results,
     }
-    if startAt is not None:
-        query_params['startAt'] = startAt
-    issues = JiraIssues(get_jira_data(url, query_params=query_params, headers=jira_request_headers)['issues'])
-    update_all_issues_cache(issues)
+    cache = get_response_cache()
+    cached_body = None
+    if cache is not None:
+        cache_key = get_cache_key(url, dict(query_params, fields=','.join(fields)))
+        max_age = get_response_cache_ttl()
+        if max_age > 0:
+            with timings.span('response cache read'):
+                body = cache.get(cache_key, max_age)
+            if body is not None:
+                timings.count('response cache hits')
+                with timings.span('json decode'):
+                    return SearchPage.from_document(json.loads(body))
+            timings.count('response cache misses')
+        # fresh responses are cached even when the cache is bypassed, later reads can use them
+        cached_body = cache.new_body(cache_key)
+    if stream_responses is True:
+        return SearchPage(iter_jira_array(url, 'issues', query_params=query_params, headers=jira_request_headers, fields=fields, cached_body=cached_body))
+    else:
+        return SearchPage.from_document(get_jira_data(url, query_params=query_params, headers=jira_request_headers, fields=fields, cached_body=cached_body))
+
+def get_response_cache():
+    global response_cache
+    with cache_lock:
+        if response_cache is None and response_cache_max_mb > 0:
+            response_cache = ResponseCache(os.path.join(result_files_dir, response_cache_file), int(response_cache_max_mb * 1024 * 1024))
+        return response_cache
+
+def get_response_cache_ttl():
+    ttl = response_cache_ttl.get()
+    return ttl if ttl is not None else response_cache_ttl_minutes * 60
+
+@contextmanager
+def command_response_cache(quickparse):
+    # '--refresh' makes every read of the command go to the server
+    token = response_cache_ttl.set(0 if '--refresh' in quickparse.options else None)
+    try:
+        yield
+    finally:
+        response_cache_ttl.reset(token)
+
+@contextmanager
+def worker_threads(max_workers):
+    # like 'with ThreadPoolExecutor()', but after an error or ^C the work that hasn't started is dropped instead of waited for
+    from concurrent.futures import ThreadPoolExecutor
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        yield executor
+    except BaseException:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown(wait=True)
+
+def iter_search_results(jql, process_page, *, fields = requested_issue_fields):
+    # process_page turns a page into an iterable of results, the first page is consumed lazily as it arrives,
+    # the rest of the pages are fetched in parallel and their results are yielded in page order
+    first_page = get_search_page(jql, 0, search_page_size, fields=fields)
+    yield from process_page(first_page)
+    # the server may silently cap maxResults so the page size it reports is the one to step with
+    page_size = min(first_page.document.get('maxResults') or search_page_size, search_page_size)
+    total = first_page.document.get('total', first_page.issue_count)
+    if first_page.issue_count > 0 and total > first_page.issue_count:
+        def fetch_page(start_at):
+            return list(process_page(get_search_page(jql, start_at, page_size, fields=fields)))
+        with worker_threads(search_page_workers) as executor:
+            pages = [jobs.submit_in_context(executor, fetch_page, start_at) for start_at in range(page_size, total, page_size)]
+            for page in pages:
+                yield from page.result()
+
+def iter_search_issues(jql, *, update_cache = True, fields = requested_issue_fields):
+    def process_page(page):
+        page_issues = JiraIssues()
+        for issue_obj in page:
+            with timings.span('parse'):
+                issue = JiraIssue(issue_obj, requested_fields=fields)
+            page_issues[issue.key] = issue
+            yield issue
+        if update_cache is True:
+            update_all_issues_cache(page_issues)
+    yield from iter_search_results(jql, process_page, fields=fields)
+
+def search_issues(jql, *, update_cache = True, fields = requested_issue_fields):
+    issues = JiraIssues()
+    for issue in iter_search_issues(jql, update_cache=update_cache, fields=fields):
+        issues[issue.key] = issue
+    return issues
+
+def search_issue_keys(jql):
+    return list(iter_search_results(jql, lambda page: (issue_obj['key'] for issue_obj in page), fields=('key', )))
+
+def get_key_ordered_jql(jql):
+    # key order from the server matches JiraIssues.to_list() so the issues can be printed as they arrive
+    if order_by_re.search(jql) is not None:
+        return None
+    return f"{jql} ORDER BY key ASC"
+
+def print_search_issues(jql, **format_options):
+    # only the fields of the listing are requested, the issue store fills in the rest from what it has
+    fields = get_listing_fields(format_options.get('variant'))
+    ordered_jql = get_key_ordered_jql(jql)
+    if ordered_jql is not None:
+        print_issues(iter_search_issues(ordered_jql, fields=fields), **format_options)
+    else:
+        print_issues(search_issues(jql, fields=fields).to_list(), **format_options)
+
+def split_issue_refs(issue_refs):
+    # keeps each 'key in (...)' clause short enough for the request URL
+    chunks = list()
+    chunk = list()
+    chunk_length = 0
+    for issue_ref in issue_refs:
+        if len(chunk) > 0 and (len(chunk) >= issue_refs_chunk_size or chunk_length + len(issue_ref) + 2 > issue_refs_chunk_max_length):
+            chunks.append(chunk)
+            chunk = list()
+            chunk_length = 0
+        chunk.append(issue_ref)
+        chunk_length += len(issue_ref) + 2
+    if len(chunk) > 0:
+        chunks.append(chunk)
+    return chunks
+
+def fetch_issue_refs_chunk(issue_refs_chunk, fields, fetch_key):
+    try:
+        return search_issues(f"key in ({', '.join(issue_refs_chunk)})", update_cache=False, fields=fields)
+    finally:
+        with issue_fetches_lock:
+            for issue_ref in issue_refs_chunk:
+                issue_fetches_in_flight.pop((issue_ref, fetch_key), None)
+
+def submit_issue_fetches(issue_refs, fields):
+    # returns a future per issue ref, a key that is already being fetched for the same job with the same fields and
+    # response cache max age is waited for instead of requested again, so a '--refresh' never gets a cached response
+    # and a job's requests write to its own output and stop when it is cancelled
+    fetch_key = (fields, get_response_cache_ttl(), jobs.current_job.get())
+    fetches = dict()
+    with issue_fetches_lock:
+        new_issue_refs = list()
+        for issue_ref in issue_refs:
+            if (issue_ref, fetch_key) in issue_fetches_in_flight:
+                fetches[issue_ref] = issue_fetches_in_flight[(issue_ref, fetch_key)]
+            else:
+                new_issue_refs.append(issue_ref)
+        for issue_refs_chunk in split_issue_refs(new_issue_refs):
+            fetch = jobs.submit_in_context(get_issue_fetch_executor(), fetch_issue_refs_chunk, issue_refs_chunk, fields, fetch_key)
+            for issue_ref in issue_refs_chunk:
+                fetches[issue_ref] = issue_fetches_in_flight[(issue_ref, fetch_key)] = fetch
+    return fetches
+
+def get_jira_issues(jira_issue_refs, *, update_cache = True, fields = requested_issue_fields):
+    issue_refs = list(dict.fromkeys(jira_issue_refs))
+    fetches = submit_issue_fetches(issue_refs, fields)
+    issues = JiraIssues()
+    for issue_ref in issue_refs:
+        fetched_issues = fetches[issue_ref].result()
+        if issue_ref in fetched_issues:
+            issues[issue_ref] = fetched_issues[issue_ref]
+    if update_cache is True:
+        update_all_issues_cache(issues)
     return issues
 
-def get_jira_issues(jira_issue_refs):
-    return search_issues(f"key in ({', '.join(jira_issue_refs)})")
+def get_issue_fetch_executor():
+    from concurrent.futures import ThreadPoolExecutor
+    global issue_fetch_executor
+    with issue_fetches_lock:
+        if issue_fetch_executor is None:
+            issue_fetch_executor = ThreadPoolExecutor(max_workers=search_page_workers)
+    return issue_fetch_executor
+
+def load_file_if_changed(file_path, parse, file_description):
+    absolute_path = os.path.abspath(file_path)
+    try:
+        file_stat = os.stat(absolute_path)
+    except OSError:
+        raise AssertionError(f"{file_description} '{file_path}' not found")
+    file_version = (file_stat.st_mtime_ns, file_stat.st_size)
+    loaded_file = loaded_files.get(absolute_path)
+    if loaded_file is not None and loaded_file[0] == file_version:
+        return loaded_file[1], False
+    content = parse(open(absolute_path).read())
+    loaded_files[absolute_path] = (file_version, content)
+    return content, True
 
 def get_user_config():
-    global jira_instance_url, jira_request_headers, queries_definition_file, result_files_dir, alert_sound_file, all_issues_file
-    assert os.path.isfile(config_toml_file_name), f"Config file '{config_toml_file_name}' not found"
-    user_config = toml.loads(open(config_toml_file_name).read())
-    for required_key in required_config_keys:
-        assert required_key in user_config, f"Key missing from {config_toml_file_name}: {required_key}"
-    jira_instance_url = user_config["jira_instance_url"]
-    key_file_path = user_config["jira_key_file"]
-    assert os.path.isfile(key_file_path), f"Key file '{key_file_path}' not found"
-    jira_request_headers = {
-        'Authorization': f'Basic {open(key_file_path).read().strip()}',
-        'Content-Type': 'application/json',
-    }
-    queries_definition_file = user_config["queries_definition_file"]
-    result_files_dir = user_config["result_files_dir"]
-    alert_sound_file = user_config["alert_sound_file"]
-    all_issues_file = user_config["all_issues_file"]
-    if not os.path.isdir(result_files_dir):
-        os.mkdir(result_files_dir)
+    global jira_instance_url, jira_request_headers, queries_definition_file, result_files_dir, alert_sound_file, all_issues_file, search_page_size, search_page_workers, http_pool_connections, http_pool_maxsize, query_workers, issue_store_file, stream_responses, watch_interval_minutes, response_cache_file, response_cache_ttl_minutes, response_cache_max_mb, queue_store_file, request_max_concurrency, request_max_retries, request_scheduler
+    import toml
+    with config_lock:
+        user_config, is_config_changed = load_file_if_changed(config_toml_file_name, toml.loads, 'Config file')
+        for required_key in required_config_keys:
+            assert required_key in user_config, f"Key missing from {config_toml_file_name}: {required_key}"
+        key_file_path = user_config["jira_key_file"]
+        jira_key, is_key_changed = load_file_if_changed(key_file_path, str.strip, 'Key file')
+        if is_config_changed is False and is_key_changed is False:
+            return user_config
+        jira_instance_url = user_config["jira_instance_url"]
+        jira_request_headers = {
+            'Authorization': f'Basic {jira_key}',
+            'Content-Type': 'application/json',
+        }
+        queries_definition_file = user_config["queries_definition_file"]
+        result_files_dir = user_config["result_files_dir"]
+        alert_sound_file = user_config["alert_sound_file"]
+        all_issues_file = user_config["all_issues_file"]
+        search_page_size = int(user_config.get("search_page_size", optional_config_defaults['search_page_size']))
+        search_page_workers = int(user_config.get("search_page_workers", optional_config_defaults['search_page_workers']))
+        http_pool_connections = int(user_config.get("http_pool_connections", optional_config_defaults['http_pool_connections']))
+        http_pool_maxsize = int(user_config.get("http_pool_maxsize", optional_config_defaults['http_pool_maxsize']))
+        query_workers = int(user_config.get("query_workers", optional_config_defaults['query_workers']))
+        issue_store_file = user_config.get("issue_store_file", optional_config_defaults['issue_store_file'])
+        stream_responses = bool(user_config.get("stream_responses", optional_config_defaults['stream_responses']))
+        watch_interval_minutes = float(user_config.get("watch_interval_minutes", optional_config_defaults['watch_interval_minutes']))
+        response_cache_file = user_config.get("response_cache_file", optional_config_defaults['response_cache_file'])
+        response_cache_ttl_minutes = float(user_config.get("response_cache_ttl_minutes", optional_config_defaults['response_cache_ttl_minutes']))
+        response_cache_max_mb = float(user_config.get("response_cache_max_mb", optional_config_defaults['response_cache_max_mb']))
+        queue_store_file = user_config.get("queue_store_file", optional_config_defaults['queue_store_file'])
+        request_max_concurrency = int(user_config.get("request_max_concurrency", optional_config_defaults['request_max_concurrency']))
+        request_max_retries = int(user_config.get("request_max_retries", optional_config_defaults['request_max_retries']))
+        # a new key or config may clear an authentication failure, the requests start over
+        request_scheduler = None
+        assert search_page_size > 0, f"Invalid search_page_size in {config_toml_file_name}: {search_page_size}"
+        assert search_page_workers > 0, f"Invalid search_page_workers in {config_toml_file_name}: {search_page_workers}"
+        assert http_pool_connections > 0, f"Invalid http_pool_connections in {config_toml_file_name}: {http_pool_connections}"
+        assert http_pool_maxsize > 0, f"Invalid http_pool_maxsize in {config_toml_file_name}: {http_pool_maxsize}"
+        assert query_workers > 0, f"Invalid query_workers in {config_toml_file_name}: {query_workers}"
+        assert watch_interval_minutes > 0, f"Invalid watch_interval_minutes in {config_toml_file_name}: {watch_interval_minutes}"
+        assert response_cache_ttl_minutes >= 0, f"Invalid response_cache_ttl_minutes in {config_toml_file_name}: {response_cache_ttl_minutes}"
+        assert response_cache_max_mb >= 0, f"Invalid response_cache_max_mb in {config_toml_file_name}: {response_cache_max_mb}"
+        assert request_max_concurrency > 0, f"Invalid request_max_concurrency in {config_toml_file_name}: {request_max_concurrency}"
+        assert request_max_retries >= 0, f"Invalid request_max_retries in {config_toml_file_name}: {request_max_retries}"
+        if not os.path.isdir(result_files_dir):
+            os.mkdir(result_files_dir)
     return user_config
 
-def get_queries():
+def build_query_index(queries):
+    queries_by_name = dict()
+    for query_title, query in queries.items():
+        queries_by_name.setdefault(query['name'], list()).append((query_title, query['jql'], query.get('passive', False) is True))
+    return {
+        'queries': queries,
+        'by_name': queries_by_name,
+        'all_names': tuple(query['name'] for query in queries.values()),
+        'active_names': tuple(query['name'] for query in queries.values() if query.get('passive', False) is not True),
+        'intervals': {query['name']: float(query['interval']) * 60 for query in queries.values() if query.get('interval') is not None},
+        'ttls': {query['name']: float(query['ttl']) * 60 for query in queries.values() if query.get('ttl') is not None},
+    }
+
+def get_query_index():
+    global query_index
     get_user_config()
-    queries = yaml.safe_load(open(queries_definition_file).read())
-    return queries
+    import yaml
+    with config_lock:
+        queries, is_changed = load_file_if_changed(queries_definition_file, yaml.safe_load, 'Queries definition file')
+        if query_index is None or query_index['queries'] is not queries:
+            query_index = build_query_index(queries)
+        return query_index
+
+def get_queries():
+    return get_query_index()['queries']
 
 def get_query(query_name):
-    queries = [(key, value) for key, value in get_queries().items() if value['name'] == query_name]
+    queries = get_query_index()['by_name'].get(query_name, list())
     assert len(queries) > 0, f"Command '{query_name}' not found in '{queries_definition_file}'"
     assert len(queries) <= 1, f"Duplicate command '{query_name}' found in '{queries_definition_file}'"
-    return queries[0][0], queries[0][1]['jql']
+    return queries[0][0], queries[0][1]
 
 def get_all_query_names():
-    return tuple(value['name'] for value in get_queries().values())
+    return get_query_index()['all_names']
 
 def get_active_query_names():
-    return tuple(value['name'] for value in get_queries().values() if value.get('passive', False) is not True)
+    return get_query_index()['active_names']
+
+def get_query_interval(query_name):
+    return get_query_index()['intervals'].get(query_name, watch_interval_minutes * 60)
+
+def get_query_ttl(query_name):
+    return get_query_index()['ttls'].get(query_name)
+
+def get_query_results_file_path(query_title):
+    return os.path.join(result_files_dir, f"{query_title}{query_results_file_suffix}")
+
+def get_query_results_version(query_title):
+    try:
+        file_stat = os.stat(get_query_results_file_path(query_title))
+    except OSError:
+        return None
+    return (file_stat.st_mtime_ns, file_stat.st_size)
+
+def load_query_results(query_title):
+    query_results_file_path = get_query_results_file_path(query_title)
+    if not os.path.isfile(query_results_file_path):
+        return import_text_query_results(query_title)
+    try:
+        with timings.span('results read'):
+            query_results = json.loads(open(query_results_file_path).read())
+    except Exception as e:
+        raise AssertionError(f"Error while loading query results '{query_results_file_path}': {e}")
+    if query_results.get('last_sync') is not None:
+        query_results['last_sync'] = datetime.fromisoformat(query_results['last_sync'])
+    return query_results
+
+def write_query_results(query_title, issues, query_sync):
+    query_results = {
+        'jql': query_sync['jql'],
+        'last_sync': query_sync['last_sync'].isoformat() if query_sync['last_sync'] is not None else None,
+        'issue_count': len(issues),
+        'issues': [[key, issues.fingerprints.get(key) or get_issue_fingerprint(issue), issue._updated_raw or issues.updated_timestamps.get(key)] for key, issue in issues.items()],
+    }
+    with timings.span('results write'):
+        content = json.dumps(query_results, separators=(',', ':'))
+        with open(get_query_results_file_path(query_title), 'w+') as jsonfile:
+            jsonfile.write(content)
+    timings.count('file bytes written', len(content.encode()))
+
+def import_text_query_results(query_title):
+    # one-time conversion of the long format result files written by earlier versions
+    text_file_path = os.path.join(result_files_dir, f"{query_title}.txt")
+    if not os.path.isfile(text_file_path):
+        return None
+    stored_issues = JiraIssues(import_core_data_sets(open(text_file_path).read()))
+    store = get_issue_store()
+    store.upsert(issue.core_data for key, issue in stored_issues.items() if key not in store)
+    write_query_results(query_title, stored_issues, {'jql': None, 'last_sync': None})
+    return load_query_results(query_title)
 
-def write_issues(filename, issues):
-    with open(os.path.join(result_files_dir, f"{filename}.txt"), 'w+') as txtfile:
-        txtfile.write(issues.format(variant='long', add_colors=False, expand_links=False, add_separator_to_multiline = False))
+def get_delta_jql(jql, last_sync):
+    # relative 'updated' offsets are evaluated by the server so the user's Jira timezone doesn't matter
+    minutes_since_sync = math.ceil((datetime.now(timezone.utc) - last_sync).total_seconds() / 60) + delta_sync_overlap_minutes
+    hit = order_by_re.search(jql)
+    order_by = hit.group() if hit is not None else ''
+    return f"({jql[:len(jql) - len(order_by)]}) AND updated >= \"-{minutes_since_sync}m\"{order_by}"
+
+def search_updated_issues(jql, last_sync, stored_issues):
+    with worker_threads(2) as executor:
+        updated_search = jobs.submit_in_context(executor, search_issues, get_delta_jql(jql, last_sync), update_cache=False)
+        keys_search = jobs.submit_in_context(executor, search_issue_keys, jql)
+        updated_issues = updated_search.result()
+        issue_keys = keys_search.result()
+    # issues can start matching the query without an update of their own, those are fetched in full
+    missing_issue_keys = [key for key in issue_keys if key not in updated_issues and key not in stored_issues]
+    if len(missing_issue_keys) > 0:
+        updated_issues.update(get_jira_issues(missing_issue_keys, update_cache=False))
+    issues = JiraIssues()
+    for key in issue_keys:
+        issues[key] = updated_issues[key] if key in updated_issues else stored_issues[key]
+    return issues
+
+def fetch_query_issues(query_name, quickparse, *, refresh = False):
+    query_title, jql = get_query(query_name)
+    query_results = load_query_results(query_title)
+    results_version = get_query_results_version(query_title)
+    stored_issues = get_stored_issues(query_results)
+    ttl = get_query_ttl(query_name)
+    is_refresh = refresh is True or '--refresh' in quickparse.options
+    # stored results older than the query's ttl are brought up to date like with '--refresh'
+    is_stale = ttl is not None and query_results is not None and query_results['last_sync'] is not None and (datetime.now(timezone.utc) - query_results['last_sync']).total_seconds() > ttl
+    if len(stored_issues) == 0 or is_refresh or is_stale:
+        # TODO: make extra params work with multiple query names
+        jql = add_extra_params(jql, quickparse)
+        sync_started = datetime.now(timezone.utc)
+        token = response_cache_ttl.set(0 if is_refresh else ttl)
+        try:
+            if len(stored_issues) > 0 and query_results['last_sync'] is not None and query_results['jql'] == jql:
+                issues = search_updated_issues(jql, query_results['last_sync'], stored_issues)
+            else:
+                issues = search_issues(jql, update_cache=False)
+        finally:
+            response_cache_ttl.reset(token)
+        return query_title, stored_issues, issues, {'jql': jql, 'last_sync': sync_started, 'results_version': results_version}
+    else:
+        return query_title, stored_issues, stored_issues, None
+
+def fetch_queries_issues(query_names, quickparse):
+    # a query that fails is reported and the others are still passed on, the command fails at the end
+    failed_query_names = list()
+    with worker_threads(query_workers) as executor:
+        fetches = [(query_name, jobs.submit_in_context(executor, fetch_query_issues, query_name, quickparse)) for query_name in query_names]
+        for query_name, fetch in fetches:
+            try:
+                query_issues = fetch.result()
+            except AssertionError as ae:
+                sys.stderr.write(f"{query_name}: {ae}\n")
+                failed_query_names.append(query_name)
+                continue
+            yield query_issues
+    assert len(failed_query_names) == 0, f"Failed to fetch {len(failed_query_names)} of {len(query_names)} queries: {', '.join(failed_query_names)}"
+
+def get_query_commit_lock(query_title):
+    with cache_lock:
+        return query_commit_locks.setdefault(query_title, threading.Lock())
+
+def commit_query_issues(query_title, stored_issues, issues, query_sync):
+    updated_issues = dict()
+    with get_query_commit_lock(query_title):
+        if query_sync is not None:
+            if get_query_results_version(query_title) != query_sync['results_version']:
+                # another job has committed this query since the fetch started, changes are taken against its results
+                stored_issues = get_stored_issues(load_query_results(query_title))
+            updated_issues = get_updated_issues(issues, stored_issues)
+            update_queue(query_title, updated_issues)
+            write_query_results(query_title, issues, query_sync)
+        if len(issues) > 0:
+            update_all_issues_cache(issues)
+    return updated_issues
+
+def get_watch_delay(query_name):
+    import random
+    return get_query_interval(query_name) * random.uniform(1 - watch_jitter_ratio, 1 + watch_jitter_ratio)
+
+def get_watch_backoff(failure_count):
+    import random
+    return min(watch_retry_base_seconds * 2 ** (failure_count - 1), watch_max_backoff_seconds) * random.uniform(1 - watch_jitter_ratio, 1 + watch_jitter_ratio)
+
+def format_watch_delay(seconds):
+    return f"{seconds:.0f} s" if seconds < 60 else f"{seconds / 60:.1f} min"
+
+def get_first_watch_due(query_name, now):
+    # a query that was refreshed recently, by 'x' or an earlier watch, is only due when its interval is over
+    query_title, jql = get_query(query_name)
+    query_results = load_query_results(query_title)
+    if query_results is None or query_results.get('last_sync') is None:
+        return now
+    age = (datetime.now(timezone.utc) - query_results['last_sync']).total_seconds()
+    return now + max(0, get_query_interval(query_name) - age)
+
+def refresh_watched_queries(query_names, quickparse, schedule, failure_counts):
+    refresh_started = time.time()
+    with worker_threads(query_workers) as executor:
+        fetches = [(query_name, jobs.submit_in_context(executor, fetch_query_issues, query_name, quickparse, refresh=True)) for query_name in query_names]
+        for query_name, fetch in fetches:
+            timestamp = datetime.now().strftime('%H:%M:%S')
+            try:
+                query_title, stored_issues, issues, query_sync = fetch.result()
+                updated_issues = commit_query_issues(query_title, stored_issues, issues, query_sync)
+            except AssertionError as ae:
+                failure_counts[query_name] = failure_counts.get(query_name, 0) + 1
+                delay = get_watch_backoff(failure_counts[query_name])
+                print(f"{timestamp} {query_name}: {ae} - retry in {format_watch_delay(delay)}")
+            else:
+                failure_counts.pop(query_name, None)
+                delay = get_watch_delay(query_name)
+                print(f"{timestamp} {query_title}: {len(issues)} issues, {len(updated_issues)} updated - next in {format_watch_delay(delay)}")
+            schedule[query_name] = time.monotonic() + delay
+    # only the items this refresh added alert, another change of an issue that is queued already doesn't grow the queue
+    new_queue_items = get_queue_store().get_items(limit=queue_alert_max_items, queued_since=refresh_started)
+    if len(new_queue_items) > 0:
+        alert_queue_items(new_queue_items)
+        print(f"Queue length: {len(get_queue_store())}")
+
+def watch_queries(quickparse):
+    # one long running process refreshes each active query on its own interval, the http pool and caches stay warm
+    schedule = dict()
+    failure_counts = dict()
+    print(f"Watching {len(get_active_query_names())} queries, ^C to stop")
+    try:
+        while True:
+            # queries.yaml is reloaded when it changes, added and removed queries are picked up here
+            active_query_names = get_active_query_names()
+            now = time.monotonic()
+            for query_name in [query_name for query_name in schedule if query_name not in active_query_names]:
+                schedule.pop(query_name)
+                failure_counts.pop(query_name, None)
+            for query_name in active_query_names:
+                if query_name not in schedule:
+                    schedule[query_name] = get_first_watch_due(query_name, now)
+            due_query_names = [query_name for query_name in active_query_names if schedule[query_name] <= now]
+            if len(due_query_names) > 0:
+                refresh_watched_queries(due_query_names, quickparse, schedule, failure_counts)
+                continue
+            next_due = min(schedule.values(), default=now + watch_max_sleep_seconds)
+            jobs.sleep(min(max(0, next_due - now), watch_max_sleep_seconds))
+    except KeyboardInterrupt:
+        print('^C')
 
 def import_core_data_of_issue(issue_text):
     core_data = dict()
@@ -343,83 +1123,371 @@ def import_core_data_sets(text):
         core_data_sets[core_data['key']] = core_data
     return core_data_sets
 
-def get_stored_issues_for_query(query_name):
-    query_title, jql = get_query(query_name)
-    query_file_path = os.path.join(result_files_dir, f"{query_title}.txt")
-    text = ''
-    if os.path.isfile(query_file_path):
-        text = open(query_file_path).read()
-    return JiraIssues(import_core_data_sets(text))
+def get_stored_issues(query_results):
+    stored_issues = JiraIssues()
+    if query_results is None:
+        return stored_issues
+    issue_keys = [key for key, *state in query_results['issues']]
+    cached_issues = get_cached_issues(issue_keys)
+    for key, fingerprint, updated in query_results['issues']:
+        if key in cached_issues:
+            stored_issues[key] = cached_issues[key]
+            stored_issues.fingerprints[key] = fingerprint
+            if updated is not None:
+                stored_issues.updated_timestamps[key] = updated
+    return stored_issues
 
-def load_all_issues_cache():
+def migrate_text_cache_to_store(store):
+    all_issues_file_path = os.path.join(result_files_dir, all_issues_file)
+    if os.path.isfile(all_issues_file_path):
+        store.upsert(import_core_data_sets(open(all_issues_file_path).read()).values())
+    store.set_meta('text_cache_migrated', datetime.now(timezone.utc).isoformat())
+
+def forget_unfetched_parent_links(store):
+    # the parent wasn't requested by earlier versions, so a stored sub-task without one has it missing rather than empty
+    core_data_sets = [core_data for core_data in store.find(parent='').values() if core_data.get('type') == subtask_issue_type and 'parent' in core_data]
+    for core_data in core_data_sets:
+        del core_data['parent']
+    store.upsert(core_data_sets)
+    store.set_meta('parent_links_migrated', datetime.now(timezone.utc).isoformat())
+
+def get_issue_store():
+    global issue_store
+    with cache_lock:
+        if issue_store is None:
+            store = IssueStore(os.path.join(result_files_dir, issue_store_file))
+            if store.get_meta('text_cache_migrated') is None:
+                migrate_text_cache_to_store(store)
+            if store.get_meta('parent_links_migrated') is None:
+                forget_unfetched_parent_links(store)
+            issue_store = store
+        return issue_store
+
+def get_issues_cache():
     global all_issues_cache
-    if all_issues_cache is None:
-        all_issues_file_path = os.path.join(result_files_dir, all_issues_file)
-        text = ''
-        if os.path.isfile(all_issues_file_path):
-            text = open(all_issues_file_path).read()
-        all_issues_cache = JiraIssues(import_core_data_sets(text))
-    return all_issues_cache
+    with cache_lock:
+        if all_issues_cache is None:
+            all_issues_cache = JiraIssues()
+        return all_issues_cache
+
+def get_cached_issue(issue_ref):
+    issues_cache = get_issues_cache()
+    if issue_ref not in issues_cache:
+        with timings.span('store read'):
+            core_data = get_issue_store().get(issue_ref)
+        if core_data is None:
+            timings.count('cache misses')
+            return None
+        timings.count('store hits')
+        with timings.span('parse'):
+            issues_cache[issue_ref] = JiraIssue(core_data)
+    else:
+        timings.count('cache hits')
+    return issues_cache[issue_ref]
+
+def get_cached_issues(issue_refs):
+    issues_cache = get_issues_cache()
+    missing_issue_refs = [issue_ref for issue_ref in issue_refs if issue_ref not in issues_cache]
+    timings.count('cache hits', len(issue_refs) - len(missing_issue_refs))
+    if len(missing_issue_refs) > 0:
+        with timings.span('store read'):
+            core_data_sets = get_issue_store().get_many(missing_issue_refs)
+        timings.count('store hits', len(core_data_sets))
+        timings.count('cache misses', len(missing_issue_refs) - len(core_data_sets))
+        with timings.span('parse'):
+            issues_cache.update(JiraIssues(core_data_sets))
+    issues = JiraIssues()
+    for issue_ref in issue_refs:
+        if issue_ref in issues_cache:
+            issues[issue_ref] = issues_cache[issue_ref]
+    return issues
+
+def load_all_issues_cache():
+    with timings.span('store read'):
+        core_data_sets = get_issue_store().get_all()
+    with timings.span('parse'):
+        return get_issues_cache().update(JiraIssues(core_data_sets))
 
 def update_all_issues_cache(issues):
-    all_issues_cache = load_all_issues_cache().update(issues)
-    with open(os.path.join(result_files_dir, all_issues_file), 'w+') as txtfile:
-        txtfile.write(all_issues_cache.format(variant='long', add_colors=False, expand_links=False, add_separator_to_multiline = False))
+    # an issue fetched without some of the stored fields takes them from its cached copy, the store keeps the merged data
+    partial_issues = [issue for issue in issues.values() if not issue.missing_fields.isdisjoint(core_issue_fields)]
+    if len(partial_issues) > 0:
+        cached_issues = get_cached_issues([issue.key for issue in partial_issues])
+        for issue in partial_issues:
+            if issue.key in cached_issues:
+                issue.fill(cached_issues[issue.key])
+    with timings.span('store write'):
+        descriptions = {key: issue.description for key, issue in issues.items() if issue.description is not None}
+        timings.count('issues stored', get_issue_store().upsert((issue.core_data for issue in issues.values()), descriptions))
+    get_issues_cache().update(issues)
+
+def fill_issue_fields(issues, attrs):
+    # fetches only the missing fields the attributes are made of, for all the partial issues in one go
+    attr_fields = get_issue_fields(attrs)
+    partial_issues = [issue for issue in issues if not issue.missing_fields.isdisjoint(attr_fields)]
+    if len(partial_issues) == 0:
+        return
+    fields = tuple(field for field in attr_fields if any(field in issue.missing_fields for issue in partial_issues))
+    fetched_issues = get_jira_issues([issue.key for issue in partial_issues], update_cache=False, fields=fields)
+    filled_issues = JiraIssues()
+    for issue in partial_issues:
+        if issue.key in fetched_issues:
+            issue.fill(fetched_issues[issue.key])
+            filled_issues[issue.key] = issue
+    if len(filled_issues) > 0:
+        update_all_issues_cache(filled_issues)
+
+def iter_filled_issues(issues, attrs):
+    # a streamed listing holds back its partial issues, and the ones behind them, until they fill a request
+    attr_fields = get_issue_fields(attrs)
+    held_issues = list()
+    partial_issue_count = 0
+    for issue in issues:
+        is_partial = not issue.missing_fields.isdisjoint(attr_fields)
+        if is_partial is False and len(held_issues) == 0:
+            yield issue
+            continue
+        held_issues.append(issue)
+        if is_partial is True:
+            partial_issue_count += 1
+        if partial_issue_count >= issue_refs_chunk_size:
+            fill_listed_issue_fields(held_issues, attrs)
+            yield from held_issues
+            held_issues = list()
+            partial_issue_count = 0
+    fill_listed_issue_fields(held_issues, attrs)
+    yield from held_issues
+
+def fill_listed_issue_fields(issues, attrs):
+    try:
+        fill_issue_fields(issues, attrs)
+    except AssertionError as ae:
+        # the listing is still worth showing, with empty fields where the issues are partial
+        sys.stderr.write(f"Can't fetch the missing fields: {ae}\n")
+
+class IssueLinkFetches(object):
+    # the parent and epic issues a listing shows with their titles, the ones neither cached nor stored are fetched
+    # with the title only on the shared executor while the listing goes on, and stored so expand_issue_link() finds them
+
+    def __init__(self, link_attrs):
+        self.link_attrs = link_attrs
+        self.title_fields = get_issue_fields(('title', ))
+        self.checked_keys = set()
+        self.pending_keys = dict()
+        self.pending_issue_count = 0
+        self.fetches = dict()
+        self.stored_fetches = set()
+        self.has_failed = False
+
+    def add(self, issue):
+        # returns the link keys of the issue that are to be fetched
+        link_keys = list()
+        for attr in self.link_attrs:
+            if issue.missing_fields.isdisjoint(issue_attr_fields[attr]):
+                link_key = getattr(issue, attr)
+                if link_key and issue_ref_re.match(link_key) is not None:
+                    link_keys.append(link_key)
+        new_keys = [key for key in link_keys if key not in self.checked_keys]
+        if len(new_keys) > 0:
+            self.checked_keys.update(new_keys)
+            cached_issues = get_cached_issues(new_keys)
+            for key in new_keys:
+                if key not in cached_issues or not cached_issues[key].missing_fields.isdisjoint(self.title_fields):
+                    self.pending_keys[key] = None
+        if len(self.pending_keys) > 0:
+            self.pending_issue_count += 1
+        return [key for key in link_keys if key in self.pending_keys or key in self.fetches]
+
+    def submit(self):
+        if len(self.pending_keys) == 0:
+            return
+        timings.count('issue links fetched', len(self.pending_keys))
+        self.fetches.update(submit_issue_fetches(list(self.pending_keys), self.title_fields))
+        self.pending_keys = dict()
+        self.pending_issue_count = 0
+
+    def is_done(self, link_keys):
+        return all(key in self.fetches and self.fetches[key].done() for key in link_keys)
+
+    def wait(self, link_keys):
+        for key in link_keys:
+            fetch = self.fetches[key]
+            if fetch in self.stored_fetches:
+                continue
+            self.stored_fetches.add(fetch)
+            try:
+                fetched_issues = fetch.result()
+            except AssertionError as ae:
+                # the listing is still worth showing, with bare keys for the links that can't be fetched
+                if self.has_failed is False:
+                    sys.stderr.write(f"Can't expand issue links: {ae}\n")
+                    self.has_failed = True
+                continue
+            update_all_issues_cache(fetched_issues)
+
+def iter_issues_with_links(issues, link_attrs):
+    links = IssueLinkFetches(link_attrs)
+    if isinstance(issues, list):
+        # a listing at hand submits all of its links at once and writes each issue as soon as its own links are in
+        issue_link_keys = [links.add(issue) for issue in issues]
+        links.submit()
+        for issue, link_keys in zip(issues, issue_link_keys):
+            links.wait(link_keys)
+            yield issue
+        return
+    # a streamed listing collects the links across pages and holds back the issues, and the ones behind them, only
+    # until their links are fetched, the fetch starts once it fills a request or a request's worth of issues waits for it
+    held_issues = deque()
+    for issue in issues:
+        link_keys = links.add(issue)
+        if len(link_keys) == 0 and len(held_issues) == 0:
+            yield issue
+            continue
+        held_issues.append((issue, link_keys))
+        if len(links.pending_keys) >= issue_refs_chunk_size or links.pending_issue_count >= issue_refs_chunk_size:
+            links.submit()
+        while len(held_issues) > 0 and links.is_done(held_issues[0][1]):
+            issue, link_keys = held_issues.popleft()
+            links.wait(link_keys)
+            yield issue
+    links.submit()
+    for issue, link_keys in held_issues:
+        links.wait(link_keys)
+        yield issue
+
+def search_cached_issues(text, *, project = None):
+    # answered from the inverted index of the issue store, the issues come in relevance order
+    with timings.span('local search'):
+        ranked_keys = get_issue_store().search(text, key_prefix=f"{project.upper()}-" if project is not None else None)
+    return get_cached_issues([key for key, score in ranked_keys])
+
+def get_issue_fingerprint(issue):
+    import hashlib
+    return hashlib.sha1(json.dumps(issue.core_data, sort_keys=True).encode()).hexdigest()[:16]
 
 def get_updated_issues(issues, stored_issues):
+    with timings.span('change detection'):
+        return find_updated_issues(issues, stored_issues)
+
+def find_updated_issues(issues, stored_issues):
+    # an unchanged 'updated' timestamp settles most issues without hashing, the digest of the tracked fields decides the rest,
+    # the digests and timestamps worked out here are kept on 'issues' for writing the results
     updated_issues = dict()
     for key, issue in issues.items():
-        if key not in stored_issues or stored_issues[key].core_data != issue.core_data:
-            updated_issues[key] = issue
+        if key not in stored_issues:
+            updated_issues[key] = (issue, tuple())
+            continue
+        stored_timestamp = stored_issues.updated_timestamps.get(key)
+        if key in stored_issues.fingerprints and (issue is stored_issues[key] or (stored_timestamp is not None and issue._updated_raw == stored_timestamp)):
+            # a stored issue is only passed on by a delta sync that found no update of it since this query's last sync
+            timings.count('issues unchanged by timestamp')
+            issues.fingerprints[key] = stored_issues.fingerprints[key]
+            if issue._updated_raw is None:
+                issues.updated_timestamps[key] = stored_timestamp
+            continue
+        if key in stored_issues.fingerprints:
+            # the registry may have been refreshed by another query, the fingerprint is what this query has seen
+            fingerprint = issues.fingerprints[key] = get_issue_fingerprint(issue)
+            if issue._updated_raw is None:
+                issues.updated_timestamps[key] = stored_timestamp
+            if stored_issues.fingerprints[key] == fingerprint:
+                continue
+        elif stored_issues[key].core_data == issue.core_data:
+            continue
+        changed_fields = get_changed_fields(stored_issues[key], issue)
+        if len(changed_fields) == 0 and stored_issues[key].core_data.keys() != issue.core_data.keys():
+            # the copies differ only in fields one of them was stored without, like the parent earlier versions didn't fetch
+            continue
+        updated_issues[key] = (issue, changed_fields)
     return updated_issues
 
-def write_queue(queue_lines, *, append = False):
-    file_mode = 'a+' if append is True else 'w+'
-    if file_mode == 'w+' or len(queue_lines) > 0:
-        with open(os.path.join(result_files_dir, queue_file_name), file_mode) as queuefile:
-            if len(queue_lines) > 0:
-                queuefile.write('\n'.join(queue_lines) + '\n')
-            else:
-                queuefile.write('')
+def get_changed_fields(stored_issue, issue):
+    # empty when the registry already has the new values from another query, a field either copy was stored without isn't compared
+    stored_core_data = stored_issue.core_data
+    core_data = issue.core_data
+    return tuple(key for key, name in issue_display_keys if key in stored_core_data and key in core_data and stored_core_data[key] != core_data[key])
 
-def update_queue(query_title, updated_issues):
-    queue_items = [f"{query_title} -- {str(issue)}" for key, issue in updated_issues.items()]
-    write_queue(queue_items, append=True)
+def get_queue_store():
+    global queue_store
+    with cache_lock:
+        if queue_store is None:
+            store = QueueStore(os.path.join(result_files_dir, queue_store_file))
+            if store.get_meta('text_queue_migrated') is None:
+                migrate_text_queue_to_store(store)
+            queue_store = store
+        return queue_store
 
-def load_queue():
+def migrate_text_queue_to_store(store):
+    # lines that don't parse are kept with the whole line as the title so nothing gets lost
     queue_file_path = os.path.join(result_files_dir, queue_file_name)
-    queue_content = ''
     if os.path.isfile(queue_file_path):
-        queue_content = open(queue_file_path).read().strip()
-    return queue_content
+        items = list()
+        for line in open(queue_file_path).read().split('\n'):
+            if len(line.strip()) == 0:
+                continue
+            hit = queue_item_re.match(line.strip())
+            if hit is not None:
+                changed_fields = [key for key, name in issue_display_keys if name in (hit.group('changed_fields') or '').split(', ')]
+                items.append((hit.group('query_title'), hit.group('key'), hit.group('title'), changed_fields))
+            else:
+                items.append(('', line.strip(), line.strip(), tuple()))
+        store.add(items)
+    store.set_meta('text_queue_migrated', datetime.now(timezone.utc).isoformat())
+
+def format_queue_item(queue_item):
+    query_title, key, title, changed_fields, revision = queue_item
+    if query_title == '':
+        return title
+    changes = f" [{', '.join(issue_display_names[field] for field in changed_fields)}]" if len(changed_fields) > 0 else ''
+    return f"{query_title} -- {key} - {title}{changes}"
+
+def update_queue(query_title, updated_issues):
+    get_queue_store().add((query_title, key, issue.title, changed_fields) for key, (issue, changed_fields) in updated_issues.items())
 
 def step_through_queue():
-    queue_lines = [line.strip() for line in load_queue().split('\n') if len(line.strip()) > 0]
-    if len(queue_lines) > 0:
-        remaining_lines = list()
+    # items are dismissed one by one, whatever other processes queue meanwhile is left alone
+    store = get_queue_store()
+    queue_items = store.get_items()
+    if len(queue_items) > 0:
         resp = None
-        for line in queue_lines:
+        for queue_item in queue_items:
             if resp != 'all skipped':
                 resp = None
             while resp not in ('', 's', 'd', 'q', 'all skipped'):
-                resp = input(f"{line}  |  S(kip) d(one) q(uit) > ").lower()
-            if resp in ('', 's', 'q', 'all skipped'):
-                remaining_lines.append(line)
+                resp = input(f"{format_queue_item(queue_item)}  |  S(kip) d(one) q(uit) > ").lower()
             if resp == 'q':
                 resp = 'all skipped'
             elif resp == 'd':
-                pass
-        write_queue(remaining_lines)
+                query_title, key, title, changed_fields, revision = queue_item
+                if not store.dismiss(query_title, key, revision):
+                    print(f"{key} changed again, it stays in the queue")
     else:
         print("Queue is empty")
 
 def print_queue():
-    queue_content = load_queue()
-    if len(queue_content) > 0:
-        print(queue_content)
+    queue_items = get_queue_store().get_items()
+    if len(queue_items) > 0:
+        print('\n'.join(format_queue_item(queue_item) for queue_item in queue_items))
     else:
         print("Queue is empty")
 
+@contextmanager
+def command_timings(quickparse):
+    # '--timings' prints a per-phase breakdown to stderr after the command, '--trace' also writes the spans as a trace file
+    if '--timings' not in quickparse.options and '--trace' not in quickparse.options:
+        yield
+        return
+    timings.start(trace='--trace' in quickparse.options)
+    try:
+        yield
+    finally:
+        wall_time = timings.stop()
+        if '--timings' in quickparse.options:
+            sys.stderr.write(timings.format_report(wall_time))
+        if '--trace' in quickparse.options:
+            timings.write_trace(quickparse.options['--trace'])
+            sys.stderr.write(f"Trace written to {quickparse.options['--trace']}\n")
+
 def convert_to_issue_ref(ref):
     issue_ref = re.sub(r"([a-zA-Z])(?=\d)", r"\1-", str(ref)).upper()
     if digits_re.match(issue_ref):
@@ -441,6 +1509,8 @@ def get_format_option(quickparse):
     return format
 
 def play_sound(filename):
+    import platform
+    import subprocess
     if 'linux' in platform.system().lower():
         p = subprocess.Popen(['aplay', os.path.join(os.getcwd(), filename)],stdout=subprocess.PIPE,stderr=subprocess.PIPE)
     else:
@@ -450,21 +1520,22 @@ def play_sound(filename):
 def show_system_notification(message):
     os.system(f"notify-send '{message}'")
 
+def alert_queue_items(queue_items):
+    if QUEUE_ALERT_PLAY_SOUND:
+        if os.path.isfile(alert_sound_file):
+            play_sound('finealert.wav')
+        elif alert_sound_file:
+            print(f"Alert sound file not found: {alert_sound_file}")
+    if QUEUE_ALERT_SHOW_SYSTEM_NOTIFICATION:
+        show_system_notification('\n'.join(format_queue_item(queue_item) for queue_item in queue_items))
+
 def alert_if_queue_not_empty():
-    queue_file_path = os.path.join(result_files_dir, queue_file_name)
-    if os.path.isfile(queue_file_path):
-        queue_items = [line for line in open(queue_file_path).read().strip().split('\n') if len(line.strip()) > 0]
-        if len(queue_items) > 0:
-            if QUEUE_ALERT_PLAY_SOUND:
-                if os.path.isfile(alert_sound_file):
-                    play_sound('finealert.wav')
-                elif alert_sound_file:
-                    print(f"Alert sound file not found: {alert_sound_file}")
-            if QUEUE_ALERT_SHOW_SYSTEM_NOTIFICATION:
-                show_system_notification('\n'.join(queue_items))
-            print(f"Queue length: {len(queue_items)}")
-        else:
-            print("Queue is empty")
+    # counts the queue and reads only the first few items for the notification
+    store = get_queue_store()
+    queue_length = len(store)
+    if queue_length > 0:
+        alert_queue_items(store.get_items(limit=queue_alert_max_items))
+        print(f"Queue length: {queue_length}")
     else:
         print("Queue is empty")
 
@@ -476,9 +1547,9 @@ def ellipsis(string, length):
 
 def expand_issue_link(field):
     if issue_ref_re.match(field) is not None:
-        issues_cache = load_all_issues_cache()
-        if field in issues_cache:
-            return f"{field} - {issues_cache[field].title}"
+        issue = get_cached_issue(field)
+        if issue is not None:
+            return f"{field} - {issue.title}"
     return field
 
 def add_extra_params(jql, quickparse):
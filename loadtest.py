@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import subprocess
+import urllib.request
+from datetime import datetime, timezone
+
+import toml
+from quickparse import QuickParse
+
+from mock_jira import MockJira, MockJiraServer, default_mock_issue_count, default_mock_page_cap
+
+
+cue_dir = os.path.dirname(os.path.abspath(__file__))
+default_touch_count = 20
+default_show_issue_count = 300
+default_search_words = 'lobby'
+
+loadtest_help_text = ''' -- cue end-to-end load test --
+python loadtest.py [--issues 2000] [--page-cap 50] [--latency-ms 50] [--jitter-ms 0] [--per-issue-ms 0] [--throttle-rate 0] [--unavailable-rate 0] [--touch 20] [--config key=value,...] [--output loadtest.json] [--verbose]
+   runs real cue commands against a local mock Jira and reports wall time, requests and bytes per scenario
+   --config overrides config.toml keys of the test workspace, e.g. --config search_page_workers=4,search_page_size=50
+'''
+
+options_config = (
+    ('-i', '--issues', int),
+    ('-c', '--page-cap', int),
+    ('-l', '--latency-ms', float),
+    ('-j', '--jitter-ms', float),
+    ('-e', '--per-issue-ms', float),
+    ('-q', '--throttle-rate', float),
+    ('-u', '--unavailable-rate', float),
+    ('-t', '--touch', int),
+    ('-g', '--config', str),
+    ('-o', '--output', str),
+    ('-v', '--verbose'),
+    ('-h', '--help'),
+)
+
+
+def parse_config_overrides(text):
+    overrides = dict()
+    for item in text.split(','):
+        assert '=' in item, f"Invalid config override: {item}"
+        name, value = item.split('=', 1)
+        overrides[name.strip()] = toml.loads(f"value = {value.strip()}")['value']
+    return overrides
+
+def create_workspace(work_dir, jira_url, config_overrides):
+    # a throwaway copy of the user files with jira_instance_url pointing to the mock
+    user_config = toml.loads(open(os.path.join(cue_dir, 'config.toml')).read())
+    user_config.update({
+        'jira_instance_url': jira_url,
+        'jira_key_file': 'key.txt',
+        'queries_definition_file': 'queries.yaml',
+        'result_files_dir': './results',
+    })
+    user_config.update(config_overrides)
+    with open(os.path.join(work_dir, 'config.toml'), 'w+') as config_file:
+        config_file.write(toml.dumps(user_config))
+    with open(os.path.join(work_dir, 'key.txt'), 'w+') as key_file:
+        key_file.write('bW9jazptb2Nr\n')
+    shutil.copy(os.path.join(cue_dir, 'queries.yaml'), work_dir)
+    os.makedirs(os.path.join(work_dir, 'results'), exist_ok=True)
+
+def post_to_mock(jira_url, path):
+    request = urllib.request.Request(f"{jira_url}{path}", method='POST')
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+def run_cue(work_dir, cli_args, verbose):
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, os.path.join(cue_dir, 'cue.py'), *cli_args], cwd=work_dir, capture_output=True, text=True)
+    wall_time = time.perf_counter() - start
+    if verbose:
+        sys.stdout.write(completed.stdout)
+        sys.stderr.write(completed.stderr)
+    return wall_time, completed
+
+def get_scenarios(mock, touch_count):
+    # 'c' goes first so that it has to fetch on a cold cache
+    show_refs = [f"UI-{issue_number}" for issue_number in range(1, min(default_show_issue_count, len(mock.issues)) + 1)]
+    return (
+        ('show issues', None, ['c', *show_refs]),
+        ('cold refresh', None, ['x', '--all', '--refresh']),
+        ('unchanged refresh', None, ['x', '--all', '--refresh']),
+        ('delta refresh', f"mock/touch?count={touch_count}", ['x', '--all', '--refresh']),
+        ('ad hoc query', None, ['xq', 'project = UI AND status != Closed']),
+        ('text search', None, ['s', default_search_words]),
+    )
+
+def run_scenarios(mock, server, work_dir, touch_count, verbose):
+    results = list()
+    for name, preparation, cli_args in get_scenarios(mock, touch_count):
+        if preparation is not None:
+            post_to_mock(server.url, preparation)
+        mock.reset_stats()
+        wall_time, completed = run_cue(work_dir, cli_args, verbose)
+        stats = mock.get_stats()
+        result = {
+            'scenario': name,
+            'command': ' '.join(cli_args[:3]) + (' ...' if len(cli_args) > 3 else ''),
+            'exit_code': completed.returncode,
+            'wall_time': wall_time,
+            'requests': stats['requests'],
+            'bytes_sent': stats['bytes_sent'],
+            'bytes_uncompressed': stats['bytes_uncompressed'],
+            'issues_sent': stats['issues_sent'],
+            'status_codes': stats['status_codes'],
+            'output_lines': completed.stdout.count('\n'),
+        }
+        results.append(result)
+        failure = '' if completed.returncode == 0 else f"  FAILED ({completed.returncode})"
+        print(f"{name:>18}: {wall_time * 1000:9.0f} ms  {result['requests']:5} requests  {result['bytes_sent'] / 1024:9.1f} KiB  {result['issues_sent']:6} issues  {result['output_lines']:6} lines{failure}")
+        if completed.returncode != 0 and not verbose:
+            # cue prints the error that stopped it as the last line of its output
+            sys.stderr.write(completed.stderr)
+            sys.stderr.write(completed.stdout[completed.stdout.rstrip('\n').rfind('\n') + 1:])
+    return results
+
+def main():
+    quickparse = QuickParse(options_config=options_config)
+    if '--help' in quickparse.options:
+        sys.stdout.write(loadtest_help_text)
+        return 0
+    options = quickparse.options
+    config_overrides = parse_config_overrides(options['--config']) if '--config' in options else dict()
+    mock = MockJira(
+        issue_count=options.get('--issues', default_mock_issue_count),
+        page_cap=options.get('--page-cap', default_mock_page_cap),
+        latency_ms=options.get('--latency-ms', 50),
+        jitter_ms=options.get('--jitter-ms', 0),
+        per_issue_ms=options.get('--per-issue-ms', 0),
+        rate_429=options.get('--throttle-rate', 0),
+        rate_503=options.get('--unavailable-rate', 0),
+    )
+    server = MockJiraServer(mock).start()
+    print(f"Mock Jira with {len(mock.issues)} issues at {server.url}")
+    try:
+        with tempfile.TemporaryDirectory(prefix='cue-loadtest-') as work_dir:
+            create_workspace(work_dir, server.url, config_overrides)
+            results = run_scenarios(mock, server, work_dir, options.get('--touch', default_touch_count), '--verbose' in options)
+    finally:
+        server.stop()
+    if '--output' in options:
+        with open(options['--output'], 'w+') as jsonfile:
+            jsonfile.write(json.dumps({
+                'meta': {
+                    'created': datetime.now(timezone.utc).isoformat(),
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'mock': {name: getattr(mock, name) for name in ('page_cap', 'latency_ms', 'jitter_ms', 'per_issue_ms', 'rate_429', 'rate_503')},
+                    'issues': len(mock.issues),
+                    'config_overrides': config_overrides,
+                },
+                'results': results,
+            }, indent=2))
+        print(f"Results written to {options['--output']}")
+    return 0 if all(result['exit_code'] == 0 for result in results) else 1
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except AssertionError as ae:
+        print(f'{ae}')
+        sys.exit(2)
@@ -0,0 +1,292 @@
+import re
+import sys
+import json
+import gzip
+import time
+import zlib
+import random
+import threading
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from quickparse import QuickParse
+
+from fake_jira_data import generate_fake_issue, format_fake_timestamp
+
+
+default_mock_port = 8765
+default_mock_issue_count = 2000
+default_mock_page_cap = 50
+
+mock_help_text = ''' -- mock Jira server --
+python mock_jira.py [--port 8765] [--issues 2000] [--page-cap 50] [--latency-ms 0] [--jitter-ms 0] [--per-issue-ms 0] [--throttle-rate 0] [--unavailable-rate 0] [--seed 0]
+   serves /rest/api/2/search from a generated dataset, point jira_instance_url to http://127.0.0.1:<port>/
+   GET /mock/stats for counters, POST /mock/reset to clear them, POST /mock/touch?count=N to update N issues
+'''
+
+options_config = (
+    ('-p', '--port', int),
+    ('-i', '--issues', int),
+    ('-c', '--page-cap', int),
+    ('-l', '--latency-ms', float),
+    ('-j', '--jitter-ms', float),
+    ('-e', '--per-issue-ms', float),
+    ('-q', '--throttle-rate', float),
+    ('-u', '--unavailable-rate', float),
+    ('-s', '--seed', int),
+    ('-h', '--help'),
+)
+
+jql_order_by_re = re.compile(r'\s+order\s+by\s+(\w+)(?:\s+(asc|desc))?\s*$', re.IGNORECASE)
+jql_updated_since_re = re.compile(r'\s+and\s+updated\s*>=\s*"?-(\d+)m"?\s*$', re.IGNORECASE)
+jql_keys_re = re.compile(r'\bkey\s+in\s*\(([^)]*)\)', re.IGNORECASE)
+jql_text_re = re.compile(r'\btext\s*~\s*"([^"]*)"', re.IGNORECASE)
+
+
+class MockJira(object):
+
+    def __init__(self, *, issue_count = default_mock_issue_count, page_cap = default_mock_page_cap, latency_ms = 0, jitter_ms = 0, per_issue_ms = 0, rate_429 = 0, rate_503 = 0, seed = 0):
+        self.page_cap = page_cap
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.per_issue_ms = per_issue_ms
+        self.rate_429 = rate_429
+        self.rate_503 = rate_503
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.issues = {issue_number: generate_fake_issue(issue_number, seed=seed) for issue_number in range(1, issue_count + 1)}
+        self.revisions = dict()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {
+                'requests': 0,
+                'search_requests': 0,
+                'bytes_sent': 0,
+                'bytes_uncompressed': 0,
+                'issues_sent': 0,
+                'status_codes': dict(),
+            }
+
+    def get_stats(self):
+        with self.lock:
+            return json.loads(json.dumps(self.stats))
+
+    def count_response(self, status_code, body_size, uncompressed_size, issue_count, is_search):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['search_requests'] += 1 if is_search else 0
+            self.stats['bytes_sent'] += body_size
+            self.stats['bytes_uncompressed'] += uncompressed_size
+            self.stats['issues_sent'] += issue_count
+            self.stats['status_codes'][str(status_code)] = self.stats['status_codes'].get(str(status_code), 0) + 1
+
+    def touch(self, count):
+        # gives 'count' random issues a new revision updated right now, so delta refreshes have something to fetch
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            issue_numbers = self.rng.sample(sorted(self.issues), min(count, len(self.issues)))
+            for issue_number in issue_numbers:
+                revision = self.revisions.get(issue_number, 0) + 1
+                issue_obj = generate_fake_issue(issue_number, seed=self.seed, revision=revision)
+                issue_obj['fields']['updated'] = format_fake_timestamp(now)
+                self.revisions[issue_number] = revision
+                self.issues[issue_number] = issue_obj
+        return [f"UI-{issue_number}" for issue_number in issue_numbers]
+
+    def draw_error(self):
+        with self.lock:
+            draw = self.rng.random()
+        if draw < self.rate_429:
+            return 429
+        if draw < self.rate_429 + self.rate_503:
+            return 503
+        return None
+
+    def get_delay(self, issue_count):
+        with self.lock:
+            jitter = self.rng.uniform(0, self.jitter_ms) if self.jitter_ms > 0 else 0
+        return (self.latency_ms + jitter + self.per_issue_ms * issue_count) / 1000
+
+    def select_issues(self, jql):
+        # understands the JQL shapes cue sends itself, any other condition selects a stable, JQL specific part of the dataset
+        order_field, order_direction = 'key', 'desc'
+        hit = jql_order_by_re.search(jql)
+        if hit is not None:
+            order_field, order_direction = hit.group(1).lower(), (hit.group(2) or 'asc').lower()
+            jql = jql[:hit.start()]
+        updated_since = None
+        hit = jql_updated_since_re.search(jql)
+        if hit is not None:
+            updated_since = datetime.now(timezone.utc) - timedelta(minutes=int(hit.group(1)))
+            jql = jql[:hit.start()].strip()
+            if jql.startswith('(') and jql.endswith(')'):
+                jql = jql[1:-1]
+        with self.lock:
+            issues = dict(self.issues)
+        keys_hit = jql_keys_re.search(jql)
+        text_hit = jql_text_re.search(jql)
+        if keys_hit is not None:
+            keys = set(key.strip().strip('"').upper() for key in keys_hit.group(1).split(','))
+            selected = [issue_obj for issue_obj in issues.values() if issue_obj['key'] in keys]
+        elif text_hit is not None:
+            words = text_hit.group(1).lower().split()
+            selected = [issue_obj for issue_obj in issues.values() if all(word in f"{issue_obj['fields']['summary']} {issue_obj['fields']['description'] or ''}".lower() for word in words)]
+        else:
+            share = 50 + zlib.crc32(jql.encode()) % 550
+            selected = [issue_obj for issue_obj in issues.values() if zlib.crc32(f"{jql}:{issue_obj['key']}".encode()) % 1000 < share]
+        if updated_since is not None:
+            selected = [issue_obj for issue_obj in selected if datetime.strptime(issue_obj['fields']['updated'], '%Y-%m-%dT%H:%M:%S.000%z') >= updated_since]
+        if order_field in ('updated', 'created'):
+            selected.sort(key=lambda issue_obj: issue_obj['fields'][order_field], reverse=order_direction == 'desc')
+        else:
+            selected.sort(key=lambda issue_obj: int(issue_obj['key'].split('-')[1]), reverse=order_direction == 'desc')
+        return selected
+
+    def search(self, query_params):
+        jql = query_params.get('jql', '')
+        start_at = max(0, int(query_params.get('startAt', 0)))
+        max_results = int(query_params.get('maxResults', self.page_cap))
+        if max_results < 0 or max_results > self.page_cap:
+            max_results = self.page_cap
+        fields = query_params.get('fields')
+        requested_fields = None if fields in (None, '', '*all') else set(fields.split(','))
+        selected = self.select_issues(jql)
+        page_issues = list()
+        for issue_obj in selected[start_at:start_at + max_results]:
+            if requested_fields is not None:
+                issue_obj = dict(issue_obj, fields={field: value for field, value in issue_obj['fields'].items() if field in requested_fields})
+            page_issues.append(issue_obj)
+        return {
+            'expand': 'names,schema',
+            'startAt': start_at,
+            'maxResults': max_results,
+            'total': len(selected),
+            'issues': page_issues,
+        }
+
+
+class MockJiraRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status_code, document, *, headers = None, issue_count = 0, is_search = False):
+        body = json.dumps(document).encode()
+        uncompressed_size = len(body)
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header('Content-Encoding', 'gzip')
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.mock.count_response(status_code, len(body), uncompressed_size, issue_count, is_search)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query_params = dict(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+        mock = self.server.mock
+        if url.path == '/mock/stats':
+            self.send_json(200, mock.get_stats())
+        elif url.path == '/rest/api/2/search':
+            if not self.headers.get('Authorization', '').startswith('Basic '):
+                self.send_json(401, {'errorMessages': ['You are not authenticated']}, headers={'X-Seraph-LoginReason': 'AUTHENTICATED_FAILED'}, is_search=True)
+                return
+            error_status = mock.draw_error()
+            if error_status == 429:
+                time.sleep(mock.get_delay(0))
+                self.send_json(429, {'errorMessages': ['Rate limit exceeded']}, headers={'Retry-After': '1'}, is_search=True)
+                return
+            if error_status == 503:
+                time.sleep(mock.get_delay(0))
+                self.send_json(503, {'errorMessages': ['Service unavailable']}, is_search=True)
+                return
+            try:
+                document = mock.search(query_params)
+            except ValueError as e:
+                self.send_json(400, {'errorMessages': [str(e)]}, is_search=True)
+                return
+            time.sleep(mock.get_delay(len(document['issues'])))
+            self.send_json(200, document, issue_count=len(document['issues']), is_search=True)
+        else:
+            self.send_json(404, {'errorMessages': [f"Not found: {url.path}"]})
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        query_params = dict(urllib.parse.parse_qsl(url.query))
+        mock = self.server.mock
+        if url.path == '/mock/reset':
+            mock.reset_stats()
+            self.send_json(200, {'reset': True})
+        elif url.path == '/mock/touch':
+            self.send_json(200, {'touched': mock.touch(int(query_params.get('count', 1)))})
+        else:
+            self.send_json(404, {'errorMessages': [f"Not found: {url.path}"]})
+
+
+class MockJiraServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, mock, port = 0):
+        super().__init__(('127.0.0.1', port), MockJiraRequestHandler)
+        self.mock = mock
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def handle_error(self, request, client_address):
+        # a client that hangs up mid-response, like a cancelled or failed cue, is not an error of the mock
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    quickparse = QuickParse(options_config=options_config)
+    if '--help' in quickparse.options:
+        sys.stdout.write(mock_help_text)
+        return
+    options = quickparse.options
+    mock = MockJira(
+        issue_count=options.get('--issues', default_mock_issue_count),
+        page_cap=options.get('--page-cap', default_mock_page_cap),
+        latency_ms=options.get('--latency-ms', 0),
+        jitter_ms=options.get('--jitter-ms', 0),
+        per_issue_ms=options.get('--per-issue-ms', 0),
+        rate_429=options.get('--throttle-rate', 0),
+        rate_503=options.get('--unavailable-rate', 0),
+        seed=options.get('--seed', 0),
+    )
+    server = MockJiraServer(mock, options.get('--port', default_mock_port))
+    print(f"Mock Jira serving {len(mock.issues)} issues at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('^C')
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import time
+import sqlite3
+import threading
+
+
+queue_store_schema = (
+    '''CREATE TABLE IF NOT EXISTS queue (
+        query_title TEXT NOT NULL,
+        key TEXT NOT NULL,
+        title TEXT NOT NULL,
+        changed_fields TEXT NOT NULL DEFAULT '',
+        revision INTEGER NOT NULL DEFAULT 1,
+        changed REAL NOT NULL,
+        queued REAL NOT NULL,
+        PRIMARY KEY (query_title, key)
+    )''',
+    'CREATE INDEX IF NOT EXISTS queue_changed ON queue (changed)',
+    # when the item was added, it stays put when the issue changes again
+    'CREATE INDEX IF NOT EXISTS queue_queued ON queue (queued)',
+    'CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)',
+)
+
+queue_item_columns = 'query_title, key, title, changed_fields, revision'
+
+
+class QueueStore(object):
+    # one item per query and issue, a new change of a queued issue replaces the old one in its place,
+    # other processes (a cron 'x --all', an interactive 'q') wait for each other's writes on the database lock
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        with self.lock, self.connection:
+            for statement in queue_store_schema:
+                self.connection.execute(statement)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def get_meta(self, name, default = None):
+        with self.lock:
+            row = self.connection.execute('SELECT value FROM meta WHERE name = ?', (name, )).fetchone()
+        return row[0] if row is not None else default
+
+    def set_meta(self, name, value):
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (name, str(value)))
+
+    def add(self, items):
+        # items are (query title, issue key, issue title, changed fields)
+        now = time.time()
+        rows = [(query_title, key, title, ','.join(changed_fields), now, now) for query_title, key, title, changed_fields in items]
+        with self.lock, self.connection:
+            self.connection.executemany('''INSERT INTO queue (query_title, key, title, changed_fields, changed, queued) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (query_title, key) DO UPDATE SET title = excluded.title, changed_fields = excluded.changed_fields,
+                revision = queue.revision + 1, changed = excluded.changed''', rows)
+        return len(rows)
+
+    def dismiss(self, query_title, key, revision):
+        # an item that changed again since it was read stays in the queue
+        with self.lock, self.connection:
+            cursor = self.connection.execute('DELETE FROM queue WHERE query_title = ? AND key = ? AND revision = ?', (query_title, key, revision))
+        return cursor.rowcount > 0
+
+    def get_items(self, *, limit = None, queued_since = None):
+        # in the order the items were first queued
+        statement = f"SELECT {queue_item_columns} FROM queue"
+        params = list()
+        if queued_since is not None:
+            statement += ' WHERE queued >= ?'
+            params.append(queued_since)
+        statement += ' ORDER BY rowid'
+        if limit is not None:
+            statement += ' LIMIT ?'
+            params.append(limit)
+        with self.lock:
+            rows = self.connection.execute(statement, params).fetchall()
+        return [(query_title, key, title, tuple(field for field in changed_fields.split(',') if field), revision) for query_title, key, title, changed_fields, revision in rows]
+
+    def peek(self):
+        items = self.get_items(limit=1)
+        return items[0] if len(items) > 0 else None
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM queue')
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM queue').fetchone()[0]
@@ -0,0 +1,103 @@
+import time
+import random
+import threading
+
+import jobs
+import timings
+
+
+class RequestScheduler(object):
+    # caps the requests in flight over all threads, the cap grows by about one per round of responses as fast as usual
+    # and is cut by a factor when they slow down or the server throttles (AIMD), until the first cut it grows by one per response
+
+    def __init__(self, max_concurrency, *, initial_concurrency, latency_tolerance, decrease_factor):
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(initial_concurrency, max_concurrency))
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.base_latency = None
+        self.recent_latency = None
+        self.latency_samples = 0
+        self.is_slow_start = True
+        self.last_decrease = 0.0
+        self.paused_until = 0.0
+        self.halt_message = None
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                assert self.halt_message is None, self.halt_message
+                jobs.check_cancelled()
+                pause = self.paused_until - time.monotonic()
+                if pause <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return time.monotonic()
+                # woken up by release(), the timeout lets cancelled jobs and ended pauses through
+                self.condition.wait(min(pause, 0.5) if pause > 0 else 0.5)
+
+    def release(self, started, *, throttled = False):
+        latency = time.monotonic() - started
+        with self.condition:
+            self.in_flight -= 1
+            if throttled is True:
+                self._decrease()
+            else:
+                self._observe(latency)
+            self.condition.notify_all()
+
+    def _observe(self, latency):
+        # the usual latency is a long running average, so a server that got slower for good becomes the new normal
+        if self.base_latency is None:
+            self.base_latency = self.recent_latency = latency
+        self.base_latency += (latency - self.base_latency) * 0.02
+        self.recent_latency += (latency - self.recent_latency) * 0.2
+        self.latency_samples += 1
+        # the first responses only tell the usual latency, page sizes and cold connections spread them widely
+        if self.latency_samples >= 20 and self.recent_latency > self.base_latency * self.latency_tolerance:
+            self._decrease()
+        elif self.is_slow_start is True:
+            self.limit = min(self.max_concurrency, self.limit + 1)
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+    def _decrease(self):
+        # one cut per round trip, the responses to requests sent before a cut don't cut again
+        now = time.monotonic()
+        if now - self.last_decrease < (self.recent_latency or 0):
+            return
+        self.limit = max(1.0, self.limit * self.decrease_factor)
+        self.is_slow_start = False
+        self.last_decrease = now
+        timings.count('concurrency decreases')
+
+    def pause(self, seconds):
+        # a Retry-After holds back every request, not only the one that was throttled
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def halt(self, message):
+        # after an authentication failure more requests only bring the captcha lockout closer
+        with self.condition:
+            self.halt_message = message
+            self.condition.notify_all()
+
+
+def parse_retry_after(value):
+    # seconds or an HTTP date, email is imported here as it pulls in socket for every command otherwise
+    import email.utils
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+def get_retry_backoff(attempt, base_seconds, max_seconds):
+    # full jitter, retries of parallel requests don't come back at the same moment
+    return random.uniform(0, min(max_seconds, base_seconds * 2 ** attempt))
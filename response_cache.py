@@ -0,0 +1,116 @@
+import time
+import zlib
+import sqlite3
+import threading
+
+
+response_cache_schema = (
+    '''CREATE TABLE IF NOT EXISTS responses (
+        cache_key TEXT PRIMARY KEY,
+        body BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        created REAL NOT NULL,
+        last_used REAL NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)',
+)
+
+
+class ResponseCache(object):
+    # response bodies by request, each read decides how old a body it accepts, the least recently used ones go first
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # losing the last writes of a cache on a crash is fine, waiting for the disk on every response is not
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = OFF')
+        with self.lock, self.connection:
+            for statement in response_cache_schema:
+                self.connection.execute(statement)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def get(self, cache_key, max_age):
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute('SELECT body, created FROM responses WHERE cache_key = ?', (cache_key, )).fetchone()
+            if row is None or now - row[1] > max_age:
+                return None
+            with self.connection:
+                self.connection.execute('UPDATE responses SET last_used = ? WHERE cache_key = ?', (now, cache_key))
+        return zlib.decompress(row[0])
+
+    def new_body(self, cache_key):
+        return CachedBody(self, cache_key)
+
+    def put(self, cache_key, body):
+        self.put_compressed(cache_key, zlib.compress(body, 1))
+
+    def put_compressed(self, cache_key, compressed_body):
+        if len(compressed_body) > self.max_size:
+            return
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO responses (cache_key, body, size, created, last_used) VALUES (?, ?, ?, ?, ?)',
+                                    (cache_key, compressed_body, len(compressed_body), now, now))
+            self._evict()
+
+    def _evict(self):
+        total_size = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total_size <= self.max_size:
+            return
+        evicted_keys = list()
+        for cache_key, size in self.connection.execute('SELECT cache_key, size FROM responses ORDER BY last_used'):
+            evicted_keys.append((cache_key, ))
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+        self.connection.executemany('DELETE FROM responses WHERE cache_key = ?', evicted_keys)
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM responses')
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+
+
+class CachedBody(object):
+    # a response body compressed chunk by chunk as it arrives, so a streamed one is never held in full,
+    # it is stored on close() unless it outgrew the cache on the way
+
+    def __init__(self, cache, cache_key):
+        self.cache = cache
+        self.cache_key = cache_key
+        self._compressor = zlib.compressobj(1)
+        self._parts = list()
+        self._size = 0
+
+    def write(self, chunk):
+        if self._parts is None:
+            return
+        part = self._compressor.compress(chunk)
+        self._size += len(part)
+        if self._size > self.cache.max_size:
+            self._parts = None
+            return
+        self._parts.append(part)
+
+    def close(self):
+        if self._parts is None:
+            return
+        self._parts.append(self._compressor.flush())
+        self.cache.put_compressed(self.cache_key, b''.join(self._parts))
+        self._parts = None
+
+
+def get_cache_key(url, query_params):
+    import hashlib
+    return hashlib.sha1(f"{url}?{'&'.join(f'{name}={query_params[name]}' for name in sorted(query_params))}".encode()).hexdigest()
@@ -0,0 +1,191 @@
+import re
+import json
+import sqlite3
+import threading
+
+
+issue_store_schema = (
+    '''CREATE TABLE IF NOT EXISTS issues (
+        key TEXT PRIMARY KEY,
+        epic TEXT NOT NULL DEFAULT '',
+        parent TEXT NOT NULL DEFAULT '',
+        assignee TEXT NOT NULL DEFAULT '',
+        status TEXT NOT NULL DEFAULT '',
+        data TEXT NOT NULL,
+        description TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS issues_epic ON issues (epic)',
+    'CREATE INDEX IF NOT EXISTS issues_parent ON issues (parent)',
+    'CREATE INDEX IF NOT EXISTS issues_assignee ON issues (assignee)',
+    'CREATE INDEX IF NOT EXISTS issues_status ON issues (status)',
+    'CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)',
+)
+
+indexed_issue_fields = ('epic', 'parent', 'assignee', 'status')
+
+# the local text search uses an FTS5 inverted index whose rowids follow the issues table,
+# the columns are ranked with these weights
+search_index_version = '1'
+search_index_columns = (
+    ('key_text', ('key', ), 4.0),
+    ('title', ('title', ), 3.0),
+    ('labels', ('labels_str', ), 2.0),
+    ('branches', ('git_branches', ), 1.5),
+    ('links', ('epic', 'parent'), 1.0),
+    ('description', ('description', ), 1.0),
+)
+search_index_schema = (
+    'DROP TABLE IF EXISTS search_index',
+    f"CREATE VIRTUAL TABLE search_index USING fts5({', '.join(column for column, fields, weight in search_index_columns)}, tokenize='unicode61', prefix='2 3')",
+)
+search_token_re = re.compile(r'[^\W_]+')
+
+# sqlite limits the number of bound variables per statement
+max_keys_per_lookup = 500
+
+
+class IssueStore(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.connection:
+            for statement in issue_store_schema:
+                self.connection.execute(statement)
+        self.has_search_index = True
+        if self.get_meta('search_index_version') != search_index_version:
+            try:
+                self.rebuild_search_index()
+            except sqlite3.OperationalError:
+                # sqlite built without FTS5, only the local search is unavailable
+                self.has_search_index = False
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def get_meta(self, name, default = None):
+        with self.lock:
+            row = self.connection.execute('SELECT value FROM meta WHERE name = ?', (name, )).fetchone()
+        return row[0] if row is not None else default
+
+    def set_meta(self, name, value):
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (name, str(value)))
+
+    def upsert(self, core_data_sets, descriptions = None):
+        # descriptions are not part of the core data, a missing one keeps what the store already has
+        descriptions = descriptions or dict()
+        core_data_sets = {core_data['key']: core_data for core_data in core_data_sets}
+        rows = [(
+            key,
+            *(core_data.get(field) or '' for field in indexed_issue_fields),
+            json.dumps(core_data, separators=(',', ':')),
+            descriptions.get(key),
+        ) for key, core_data in core_data_sets.items()]
+        with self.lock, self.connection:
+            if self.has_search_index is True:
+                stored_rows = self._get_rows(core_data_sets.keys(), 'rowid, data, description')
+                # only issues whose indexed text changed are indexed again
+                changed_rows = [row for row in rows if row[0] not in stored_rows or stored_rows[row[0]][1] != row[5] or row[6] not in (None, stored_rows[row[0]][2])]
+                self.connection.executemany('DELETE FROM search_index WHERE rowid = ?', [(stored_rows[row[0]][0], ) for row in changed_rows if row[0] in stored_rows])
+            self.connection.executemany('''INSERT INTO issues (key, epic, parent, assignee, status, data, description) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET epic = excluded.epic, parent = excluded.parent, assignee = excluded.assignee, status = excluded.status,
+                data = excluded.data, description = COALESCE(excluded.description, issues.description)''', rows)
+            if self.has_search_index is True:
+                new_rowids = self._get_rows([row[0] for row in changed_rows if row[0] not in stored_rows], 'rowid')
+                self._insert_into_search_index((
+                    stored_rows[key][0] if key in stored_rows else new_rowids[key][0],
+                    core_data_sets[key],
+                    description if description is not None or key not in stored_rows else stored_rows[key][2],
+                ) for key, *fields, data, description in changed_rows)
+        return len(rows)
+
+    def delete(self, keys):
+        keys = list(keys)
+        with self.lock, self.connection:
+            if self.has_search_index is True:
+                self._delete_from_search_index(keys)
+            for index in range(0, len(keys), max_keys_per_lookup):
+                chunk = keys[index:index + max_keys_per_lookup]
+                self.connection.execute(f"DELETE FROM issues WHERE key IN ({', '.join('?' * len(chunk))})", chunk)
+
+    def _delete_from_search_index(self, keys):
+        self.connection.executemany('DELETE FROM search_index WHERE rowid = ?', [(rowid, ) for rowid, in self._get_rows(keys, 'rowid').values()])
+
+    def _get_rows(self, keys, columns):
+        keys = list(keys)
+        rows = dict()
+        for index in range(0, len(keys), max_keys_per_lookup):
+            chunk = keys[index:index + max_keys_per_lookup]
+            for key, *values in self.connection.execute(f"SELECT key, {columns} FROM issues WHERE key IN ({', '.join('?' * len(chunk))})", chunk):
+                rows[key] = values
+        return rows
+
+    def _insert_into_search_index(self, rows):
+        index_rows = list()
+        for rowid, core_data, description in rows:
+            index_rows.append((rowid, *(' '.join((description if field == 'description' else core_data.get(field)) or '' for field in fields) for column, fields, weight in search_index_columns)))
+        columns = ', '.join(column for column, fields, weight in search_index_columns)
+        self.connection.executemany(f"INSERT INTO search_index (rowid, {columns}) VALUES (?, {', '.join('?' * len(search_index_columns))})", index_rows)
+
+    def rebuild_search_index(self):
+        with self.lock, self.connection:
+            for statement in search_index_schema:
+                self.connection.execute(statement)
+            self._insert_into_search_index((rowid, json.loads(data), description) for rowid, data, description in self.connection.execute('SELECT rowid, data, description FROM issues').fetchall())
+            self.connection.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', ('search_index_version', search_index_version))
+
+    def search(self, text, *, key_prefix = None):
+        # every word has to match a whole token or the start of one, the best bm25 score comes first
+        assert self.has_search_index is True, 'Local search needs SQLite with the FTS5 extension'
+        match_expression = ' '.join(f'"{token}"*' for token in dict.fromkeys(tokenize(text)))
+        if len(match_expression) == 0:
+            return list()
+        weights = ', '.join(str(weight) for column, fields, weight in search_index_columns)
+        statement = f"SELECT issues.key, bm25(search_index, {weights}) AS score FROM search_index JOIN issues ON issues.rowid = search_index.rowid WHERE search_index MATCH ?"
+        params = [match_expression]
+        if key_prefix is not None:
+            statement += ' AND issues.key >= ? AND issues.key < ?'
+            params.extend((key_prefix, f"{key_prefix}\U0010ffff"))
+        with self.lock:
+            return [(key, -score) for key, score in self.connection.execute(f"{statement} ORDER BY score", params)]
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute('SELECT data FROM issues WHERE key = ?', (key, )).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def get_many(self, keys):
+        keys = list(dict.fromkeys(keys))
+        core_data_sets = dict()
+        with self.lock:
+            for index in range(0, len(keys), max_keys_per_lookup):
+                chunk = keys[index:index + max_keys_per_lookup]
+                for key, data in self.connection.execute(f"SELECT key, data FROM issues WHERE key IN ({', '.join('?' * len(chunk))})", chunk):
+                    core_data_sets[key] = json.loads(data)
+        return {key: core_data_sets[key] for key in keys if key in core_data_sets}
+
+    def find(self, **conditions):
+        unknown_fields = [field for field in conditions if field not in indexed_issue_fields]
+        assert len(unknown_fields) == 0, f"Issue store can't look up by: {', '.join(unknown_fields)}"
+        where_clause = ' AND '.join(f"{field} = ?" for field in conditions) or '1'
+        with self.lock:
+            rows = self.connection.execute(f"SELECT key, data FROM issues WHERE {where_clause}", tuple(conditions.values())).fetchall()
+        return {key: json.loads(data) for key, data in rows}
+
+    def get_all(self):
+        return self.find()
+
+    def __contains__(self, key):
+        with self.lock:
+            return self.connection.execute('SELECT 1 FROM issues WHERE key = ?', (key, )).fetchone() is not None
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM issues').fetchone()[0]
+
+
+def tokenize(text):
+    return search_token_re.findall((text or '').lower())
@@ -0,0 +1,53 @@
+import json
+import random
+import unittest
+
+from jsonstream import JsonArrayStream
+
+
+document = {
+    'startAt': 0,
+    'maxResults': 50,
+    'issues': [12.5, 3e4, -0.25, 7, 1.5e-3, 'UI-1', True, None, {'key': 'UI-2', 'fields': {'timespent': 1800}}, [1, 2.75]],
+    'total': 10,
+}
+
+
+def split_at(data, positions):
+    positions = (0, *positions, len(data))
+    return [data[start:end] for start, end in zip(positions, positions[1:])]
+
+
+class JsonArrayStreamTest(unittest.TestCase):
+
+    def assert_decodes(self, chunks):
+        stream = JsonArrayStream(chunks, 'issues')
+        self.assertEqual(list(stream), document['issues'])
+        self.assertEqual(stream.document, dict(document, issues=list()))
+
+    def test_numbers_split_at_every_position(self):
+        # '12|.5' and '3|e4' used to be decoded as the integer part
+        data = json.dumps(document).encode()
+        for position in range(1, len(data)):
+            with self.subTest(split=data[:position][-8:]):
+                self.assert_decodes(split_at(data, (position, )))
+
+    def test_random_chunk_sizes(self):
+        data = json.dumps(document, separators=(',', ':')).encode()
+        rng = random.Random(9)
+        for run in range(200):
+            positions = sorted(rng.sample(range(1, len(data)), rng.randrange(1, 20)))
+            with self.subTest(positions=positions):
+                self.assert_decodes(split_at(data, positions))
+
+    def test_number_at_the_end_of_the_input(self):
+        stream = JsonArrayStream([b'{"issues": [1, 2.', b'5', b']}'], 'issues')
+        self.assertEqual(list(stream), [1, 2.5])
+
+    def test_truncated_array(self):
+        with self.assertRaises(json.JSONDecodeError):
+            list(JsonArrayStream([b'{"issues": [1, 2.'], 'issues'))
+
+
+if __name__ == '__main__':
+    unittest.main()
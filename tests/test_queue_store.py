@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+import itertools
+from unittest import mock
+
+from queue_store import QueueStore
+
+
+class QueueStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'queue.sqlite3')
+        self.store = QueueStore(self.path)
+        clock = itertools.count(1000)
+        patcher = mock.patch('queue_store.time.time', side_effect=lambda: float(next(clock)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def test_one_item_per_query_and_issue(self):
+        self.store.add([('bugs', 'UI-1', 'Crash', ('status', )), ('bugs', 'UI-2', 'Layout', ())])
+        self.store.add([('bugs', 'UI-1', 'Crash on login', ('title', )), ('mine', 'UI-1', 'Crash on login', ('title', ))])
+        self.assertEqual(self.store.get_items(), [
+            ('bugs', 'UI-1', 'Crash on login', ('title', ), 2),
+            ('bugs', 'UI-2', 'Layout', (), 1),
+            ('mine', 'UI-1', 'Crash on login', ('title', ), 1),
+        ])
+        self.assertEqual(len(self.store), 3)
+
+    def test_dismiss_keeps_items_that_changed_again(self):
+        self.store.add([('bugs', 'UI-1', 'Crash', ('status', ))])
+        query_title, key, title, changed_fields, revision = self.store.peek()
+        self.store.add([('bugs', 'UI-1', 'Crash', ('assignee', ))])
+        self.assertFalse(self.store.dismiss(query_title, key, revision))
+        self.assertEqual(self.store.peek(), ('bugs', 'UI-1', 'Crash', ('assignee', ), 2))
+        self.assertTrue(self.store.dismiss(query_title, key, revision + 1))
+        self.assertIsNone(self.store.peek())
+
+    def test_queued_since_leaves_out_revision_bumps(self):
+        self.store.add([('bugs', 'UI-1', 'Crash', ('status', ))])
+        refresh_started = 1500.0
+        with mock.patch('queue_store.time.time', return_value=2000.0):
+            self.store.add([('bugs', 'UI-1', 'Crash', ('assignee', )), ('bugs', 'UI-2', 'Layout', ('status', ))])
+        self.assertEqual([key for query_title, key, *rest in self.store.get_items(queued_since=refresh_started)], ['UI-2'])
+
+    def test_limit_in_queued_order(self):
+        self.store.add([('bugs', f"UI-{number}", 'Title', ()) for number in range(5)])
+        self.store.add([('bugs', 'UI-0', 'Title', ('status', ))])
+        self.assertEqual([key for query_title, key, *rest in self.store.get_items(limit=2)], ['UI-0', 'UI-1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
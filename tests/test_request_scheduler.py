@@ -0,0 +1,128 @@
+import time
+import threading
+import unittest
+import email.utils
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from request_scheduler import RequestScheduler, parse_retry_after, get_retry_backoff
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RequestSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch('request_scheduler.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = RequestScheduler(16, initial_concurrency=4, latency_tolerance=3.0, decrease_factor=0.5)
+
+    def send(self, latency, *, throttled = False):
+        started = self.scheduler.acquire()
+        self.clock.now += latency
+        self.scheduler.release(started, throttled=throttled)
+
+    def test_grows_by_one_per_response_until_the_first_cut(self):
+        for count in range(3):
+            self.send(0.1)
+        self.assertEqual(self.scheduler.limit, 7)
+        for count in range(20):
+            self.send(0.1)
+        self.assertEqual(self.scheduler.limit, 16)
+
+    def test_throttling_halves_the_limit_then_it_grows_additively(self):
+        for count in range(4):
+            self.send(0.1)
+        self.send(0.1, throttled=True)
+        self.assertEqual(self.scheduler.limit, 4)
+        for count in range(4):
+            self.send(0.1)
+        self.assertGreater(self.scheduler.limit, 4.9)
+        self.assertLess(self.scheduler.limit, 5)
+
+    def test_one_cut_per_round_trip(self):
+        for count in range(4):
+            self.send(1.0)
+        self.send(0.0, throttled=True)
+        self.send(0.0, throttled=True)
+        self.assertEqual(self.scheduler.limit, 4)
+        self.clock.now += 1.0
+        self.send(0.0, throttled=True)
+        self.assertEqual(self.scheduler.limit, 2)
+
+    def test_slow_responses_cut_the_limit(self):
+        for count in range(20):
+            self.send(0.1)
+        self.assertEqual(self.scheduler.limit, 16)
+        for count in range(10):
+            self.send(2.0)
+        self.assertLess(self.scheduler.limit, 16)
+
+    def test_slow_first_responses_only_set_the_usual_latency(self):
+        for count in range(10):
+            self.send(0.1)
+            self.send(2.0)
+        self.assertEqual(self.scheduler.limit, 16)
+
+    def test_requests_over_the_limit_wait(self):
+        scheduler = RequestScheduler(2, initial_concurrency=2, latency_tolerance=3.0, decrease_factor=0.5)
+        starts = [scheduler.acquire(), scheduler.acquire()]
+        acquired = threading.Event()
+        thread = threading.Thread(target=lambda: (scheduler.acquire(), acquired.set()))
+        thread.start()
+        self.assertFalse(acquired.wait(0.1))
+        scheduler.release(starts[0])
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+
+    def test_halt_stops_every_request(self):
+        self.scheduler.halt('HTTP Error: 401 - unauthorized')
+        with self.assertRaisesRegex(AssertionError, '401'):
+            self.scheduler.acquire()
+
+
+class PauseTest(unittest.TestCase):
+
+    def test_pause_holds_back_requests(self):
+        scheduler = RequestScheduler(4, initial_concurrency=4, latency_tolerance=3.0, decrease_factor=0.5)
+        scheduler.pause(0.2)
+        started = time.monotonic()
+        scheduler.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+
+class RetryAfterTest(unittest.TestCase):
+
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after('120'), 120.0)
+        self.assertEqual(parse_retry_after(' 0 '), 0.0)
+
+    def test_http_date(self):
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+        self.assertAlmostEqual(parse_retry_after(email.utils.format_datetime(retry_at, usegmt=True)), 30, delta=2)
+
+    def test_http_date_in_the_past(self):
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after('-5'))
+
+    def test_backoff_is_capped(self):
+        for attempt in range(10):
+            self.assertLessEqual(get_retry_backoff(attempt, 1, 60), min(60, 2 ** attempt))
+            self.assertGreaterEqual(get_retry_backoff(attempt, 1, 60), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import itertools
+from unittest import mock
+
+from response_cache import ResponseCache, get_cache_key
+
+
+def get_body(seed, size = 400):
+    # random bytes don't compress, so the stored size is about the body size
+    return random.Random(seed).randbytes(size)
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ResponseCache(os.path.join(self.directory, 'responses.sqlite3'), 1000)
+        clock = itertools.count(1000)
+        patcher = mock.patch('response_cache.time.time', side_effect=lambda: float(next(clock)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory)
+
+    def test_least_recently_used_goes_first(self):
+        self.cache.put('a', get_body(1))
+        self.cache.put('b', get_body(2))
+        self.assertEqual(self.cache.get('a', 60), get_body(1))
+        self.cache.put('c', get_body(3))
+        self.assertIsNone(self.cache.get('b', 60))
+        self.assertEqual(self.cache.get('a', 60), get_body(1))
+        self.assertEqual(self.cache.get('c', 60), get_body(3))
+
+    def test_evicts_until_the_size_fits(self):
+        for seed in range(2):
+            self.cache.put(str(seed), get_body(seed))
+        self.cache.put('large', get_body(9, 900))
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.get('large', 60), get_body(9, 900))
+
+    def test_bodies_over_the_max_size_are_not_stored(self):
+        self.cache.put('huge', get_body(1, 2000))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_max_age(self):
+        self.cache.put('a', b'{"issues": []}')
+        self.assertIsNone(self.cache.get('a', 0))
+        self.assertEqual(self.cache.get('a', 60), b'{"issues": []}')
+
+    def test_body_written_in_chunks(self):
+        body = self.cache.new_body('a')
+        for chunk in (b'{"issues": [', b'{"key": "UI-1"}', b', {"key": "UI-2"}', b']}'):
+            body.write(chunk)
+        self.assertIsNone(self.cache.get('a', 60))
+        body.close()
+        self.assertEqual(self.cache.get('a', 60), b'{"issues": [{"key": "UI-1"}, {"key": "UI-2"}]}')
+
+    def test_body_that_outgrows_the_cache_is_dropped_on_the_way(self):
+        body = self.cache.new_body('huge')
+        for seed in range(3):
+            body.write(get_body(seed, 100000))
+        # the compressed parts are let go as soon as they are over the cache size
+        self.assertIsNone(body._parts)
+        body.close()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_cache_key_ignores_the_order_of_the_params(self):
+        self.assertEqual(get_cache_key('url', {'jql': 'x', 'startAt': 0}), get_cache_key('url', {'startAt': 0, 'jql': 'x'}))
+        self.assertNotEqual(get_cache_key('url', {'jql': 'x', 'startAt': 0}), get_cache_key('url', {'jql': 'x', 'startAt': 50}))
+
+
+if __name__ == '__main__':
+    unittest.main()
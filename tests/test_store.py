@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from store import IssueStore
+
+
+def core_data(key, title, **fields):
+    return dict(fields, key=key, title=title)
+
+
+class IssueStoreSearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = IssueStore(os.path.join(self.directory, 'issues.sqlite3'))
+        if self.store.has_search_index is False:
+            self.skipTest('SQLite without FTS5')
+        self.store.upsert((
+            core_data('UI-1', 'Cashier dialog crash'),
+            core_data('UI-2', 'Lobby layout', labels_str='cashier'),
+            core_data('UI-3', 'Player history'),
+            core_data('QA-4', 'Cashier balance check'),
+        ), {'UI-3': 'the cashier dialog shows a stale balance'})
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def search_keys(self, text, **options):
+        return [key for key, score in self.store.search(text, **options)]
+
+    def test_prefix_matches_the_start_of_a_token(self):
+        self.assertEqual(set(self.search_keys('cash')), {'UI-1', 'UI-2', 'UI-3', 'QA-4'})
+        self.assertEqual(self.search_keys('ashier'), list())
+
+    def test_title_ranks_over_labels_and_description(self):
+        keys = self.search_keys('cashier', key_prefix='UI-')
+        self.assertEqual(keys, ['UI-1', 'UI-2', 'UI-3'])
+
+    def test_every_word_has_to_match(self):
+        self.assertEqual(self.search_keys('cash dia'), ['UI-1', 'UI-3'])
+        self.assertEqual(self.search_keys('cashier lobby'), ['UI-2'])
+
+    def test_key_prefix(self):
+        self.assertEqual(self.search_keys('cashier', key_prefix='QA-'), ['QA-4'])
+
+    def test_updated_text_is_indexed_again(self):
+        self.store.upsert((core_data('UI-1', 'Dialog crash'), ))
+        self.assertNotIn('UI-1', self.search_keys('cashier'))
+        self.assertIn('UI-1', self.search_keys('dialog'))
+
+    def test_deleted_issues_are_not_found(self):
+        self.store.delete(('UI-2', ))
+        self.assertNotIn('UI-2', self.search_keys('cashier'))
+
+
+if __name__ == '__main__':
+    unittest.main()
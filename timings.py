@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import threading
+
+
+# collection is off unless a command asks for it, the helpers below are no-ops then
+is_enabled = False
+is_tracing = False
+timings_lock = threading.Lock()
+thread_state = threading.local()
+phases = dict()
+counters = dict()
+trace_events = list()
+started_at = None
+
+
+class NullSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+null_span = NullSpan()
+
+
+class Span(object):
+    # phases nest per thread, a phase is charged with its own time only, without the time of the phases inside
+
+    __slots__ = ('name', 'args', 'start', 'child_time')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = get_span_stack()
+        stack.append(self)
+        self.child_time = 0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        duration = end - self.start
+        stack = get_span_stack()
+        stack.pop()
+        if len(stack) > 0:
+            stack[-1].child_time += duration
+        with timings_lock:
+            phase = phases.get(self.name)
+            if phase is None:
+                phase = phases[self.name] = [0, 0.0, 0.0]
+            phase[0] += 1
+            phase[1] += duration - self.child_time
+            phase[2] += duration
+            if is_tracing is True:
+                trace_events.append({
+                    'name': self.name,
+                    'ph': 'X',
+                    'ts': (self.start - started_at) * 1e6,
+                    'dur': duration * 1e6,
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                    'args': self.args or dict(),
+                })
+        return False
+
+
+def get_span_stack():
+    stack = getattr(thread_state, 'spans', None)
+    if stack is None:
+        stack = thread_state.spans = list()
+    return stack
+
+def start(*, trace = False):
+    global is_enabled, is_tracing, started_at
+    with timings_lock:
+        phases.clear()
+        counters.clear()
+        trace_events.clear()
+        started_at = time.perf_counter()
+        is_enabled = True
+        is_tracing = trace
+
+def stop():
+    global is_enabled, is_tracing
+    with timings_lock:
+        is_enabled = False
+        is_tracing = False
+    return time.perf_counter() - started_at
+
+def span(name, **args):
+    if is_enabled is False:
+        return null_span
+    return Span(name, args)
+
+def timed_iter(name, iterable):
+    # charges the time spent producing each item to 'name', the consumer's time is not included
+    if is_enabled is False:
+        return iterable
+    return _timed_iter(name, iter(iterable))
+
+def _timed_iter(name, iterator):
+    while True:
+        with Span(name, None):
+            try:
+                item = next(iterator)
+            except StopIteration as stop:
+                return stop.value
+        yield item
+
+def count(name, amount = 1):
+    if is_enabled is False:
+        return
+    with timings_lock:
+        counters[name] = counters.get(name, 0) + amount
+
+def format_report(wall_time):
+    with timings_lock:
+        phase_rows = sorted(phases.items(), key=lambda item: item[1][1], reverse=True)
+        counter_rows = sorted(counters.items())
+    lines = [f"-- timings: {wall_time * 1000:.0f} ms wall, phase times are summed over threads --"]
+    for name, (calls, self_time, total_time) in phase_rows:
+        lines.append(f"{name:>20}: {self_time * 1000:10.1f} ms  {calls:7} calls  {total_time * 1000:10.1f} ms incl. nested")
+    for name, value in counter_rows:
+        lines.append(f"{name:>20}: {value:10}")
+    return '\n'.join(lines) + '\n'
+
+def write_trace(trace_file_path):
+    # Chrome trace event format, opens in chrome://tracing, Perfetto or speedscope
+    with timings_lock:
+        events = list(trace_events)
+    metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': f"thread {index}"}}
+                for index, tid in enumerate(dict.fromkeys(event['tid'] for event in events))]
+    with open(trace_file_path, 'w+') as tracefile:
+        tracefile.write(json.dumps({'traceEvents': metadata + events, 'displayTimeUnit': 'ms', 'otherData': {'counters': dict(counters)}}))